@@ -6,6 +6,9 @@ from firebase_admin import auth, credentials
 from django.conf import settings
 from rest_framework import authentication, exceptions
 from .models import User
+from .profile_sync import diff_claims, profile_sync
+from .signing_keys import signing_key_store
+from .token_cache import token_cache
 import os
 
 
@@ -25,6 +28,14 @@ def initialize_firebase():
             print(f"Firebase initialization error: {e}")
 
 
+def verify_firebase_token(id_token):
+    """Verify an ID token against the local key store, falling back to the SDK"""
+    if settings.FIREBASE_LOCAL_VERIFICATION and signing_key_store.is_ready:
+        return signing_key_store.verify(id_token)
+    initialize_firebase()
+    return auth.verify_id_token(id_token)
+
+
 class FirebaseAuthentication(authentication.BaseAuthentication):
     """
     Firebase ID Token authentication for DRF
@@ -46,19 +57,28 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
         
         id_token = parts[1]
         
+        # Serve repeat requests with the same token from the verified cache
+        cached = token_cache.get(id_token)
+        if cached is not None:
+            decoded_token, user_id = cached
+            try:
+                user = User.objects.select_related('managed_canteen').get(
+                    pk=user_id, is_active=True
+                )
+                return (user, decoded_token)
+            except User.DoesNotExist:
+                token_cache.discard(id_token)
+        
         try:
-            # Initialize Firebase if needed
-            initialize_firebase()
-            
             # Verify the Firebase ID token
-            decoded_token = auth.verify_id_token(id_token)
+            decoded_token = verify_firebase_token(id_token)
             firebase_uid = decoded_token['uid']
             email = decoded_token.get('email', '')
             name = decoded_token.get('name', '')
             picture = decoded_token.get('picture', '')
             
-            # Get or create user
-            user, created = User.objects.get_or_create(
+            # Get or create user; managed_canteen is read by most permission checks
+            user, created = User.objects.select_related('managed_canteen').get_or_create(
                 firebase_uid=firebase_uid,
                 defaults={
                     'email': email,
@@ -67,20 +87,12 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
                 }
             )
             
-            # Update user info if changed
+            # Queue changed profile claims instead of writing on the request path
             if not created:
-                updated = False
-                if email and user.email != email:
-                    user.email = email
-                    updated = True
-                if name and user.name != name:
-                    user.name = name
-                    updated = True
-                if picture and user.profile_picture != picture:
-                    user.profile_picture = picture
-                    updated = True
-                if updated:
-                    user.save()
+                profile_sync.record(user, diff_claims(user, decoded_token))
+            
+            if user.is_active:
+                token_cache.set(id_token, decoded_token, user.pk)
             
             return (user, decoded_token)
             
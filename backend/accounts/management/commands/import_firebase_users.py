@@ -0,0 +1,217 @@
+"""
+Management command to bulk import users from a Firebase Auth export
+"""
+import csv
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User
+from accounts.token_cache import token_cache
+
+
+# Column positions in `firebase auth:export --format=csv` output
+CSV_UID = 0
+CSV_EMAIL = 1
+CSV_NAME = 5
+CSV_PHOTO_URL = 6
+CSV_CREATED_AT = 23
+CSV_PHONE = 25
+
+READ_SIZE = 64 * 1024
+
+
+def iter_json_users(f):
+    """
+    Stream user objects out of a `{"users": [...]}` export without loading
+    the whole file into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while '[' not in buffer:
+        if eof:
+            raise CommandError('No "users" array found in export file')
+        fill()
+    pos = buffer.index('[') + 1
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                return
+            fill()
+            continue
+        if buffer[pos] == ']':
+            return
+
+        try:
+            user, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Malformed user record in export file')
+            # Record spans the read boundary
+            fill()
+            continue
+
+        yield {
+            'uid': user.get('localId', ''),
+            'email': user.get('email', ''),
+            'name': user.get('displayName', ''),
+            'picture': user.get('photoUrl', ''),
+            'phone': user.get('phoneNumber', ''),
+            'created_at': user.get('createdAt', ''),
+            'disabled': bool(user['disabled']) if 'disabled' in user else None,
+        }
+
+
+def iter_csv_users(f):
+    """Stream user rows out of a CSV export"""
+    for row in csv.reader(f):
+        if not row or len(row) <= CSV_EMAIL:
+            continue
+        yield {
+            'uid': row[CSV_UID],
+            'email': row[CSV_EMAIL],
+            'name': row[CSV_NAME] if len(row) > CSV_NAME else '',
+            'picture': row[CSV_PHOTO_URL] if len(row) > CSV_PHOTO_URL else '',
+            'phone': row[CSV_PHONE] if len(row) > CSV_PHONE else '',
+            'created_at': row[CSV_CREATED_AT] if len(row) > CSV_CREATED_AT else '',
+            # The CSV export has no disabled column
+            'disabled': None,
+        }
+
+
+def parse_timestamp(value):
+    """Firebase exports creation time as epoch milliseconds"""
+    try:
+        return datetime.fromtimestamp(int(value) / 1000, tz=dt_timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users from a Firebase Auth export (JSON or CSV)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='Path to the file produced by `firebase auth:export`'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['json', 'csv'],
+            help='Export format (defaults to the file extension)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows upserted per statement'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'json')
+
+        try:
+            f = open(path, encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f'Cannot open "{path}": {e}')
+
+        started = time.monotonic()
+        imported = 0
+        skipped = 0
+
+        with f:
+            rows = iter_csv_users(f) if file_format == 'csv' else iter_json_users(f)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                written, rejected = self.upsert_batch(batch)
+                imported += written
+                skipped += rejected
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'  {imported} imported, {skipped} skipped '
+                    f'({imported / elapsed if elapsed else 0:.0f} users/s)'
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {imported} users in {elapsed:.1f}s, skipped {skipped}'
+            )
+        )
+
+    def upsert_batch(self, batch):
+        """Insert or update one batch; returns (written, skipped)"""
+        # Keep the last record per uid/email so one statement never conflicts with itself
+        by_uid = {}
+        for row in batch:
+            if row['uid'] and row['email']:
+                row['email'] = User.objects.normalize_email(row['email'])
+                by_uid[row['uid']] = row
+        rows = list({row['email']: row for row in by_uid.values()}.values())
+
+        # Email is unique too; rows owned by a different account can't be upserted
+        owners = dict(
+            User.objects.filter(email__in=[row['email'] for row in rows])
+            .values_list('email', 'firebase_uid')
+        )
+        rows = [
+            row for row in rows
+            if row['email'] not in owners or owners[row['email']] == row['uid']
+        ]
+
+        users = []
+        for row in rows:
+            user = User(
+                firebase_uid=row['uid'],
+                email=row['email'],
+                name=row['name'][:255],
+                profile_picture=row['picture'][:500],
+                phone=row['phone'][:15],
+                # Only new users take this; see the deactivation below
+                is_active=not row['disabled'],
+            )
+            created_at = parse_timestamp(row['created_at'])
+            if created_at:
+                user.date_joined = created_at
+            users.append(user)
+
+        User.objects.bulk_create(
+            users,
+            update_conflicts=True,
+            unique_fields=['firebase_uid'],
+            update_fields=['email', 'name', 'profile_picture', 'phone'],
+        )
+
+        # Existing users are only ever deactivated, so an account deactivated
+        # or banned here stays that way on re-import
+        disabled = [row['uid'] for row in rows if row['disabled']]
+        if disabled:
+            deactivated = list(
+                User.objects.filter(firebase_uid__in=disabled, is_active=True)
+                .values_list('pk', flat=True)
+            )
+            User.objects.filter(pk__in=deactivated).update(is_active=False)
+            # .update() skips the post_save handler that flushes cached tokens
+            for pk in deactivated:
+                token_cache.invalidate_user(pk)
+        return len(users), len(batch) - len(users)
@@ -0,0 +1,92 @@
+"""
+Write-behind sync of Firebase profile claims onto User rows
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+logger = logging.getLogger(__name__)
+
+# Firebase claim -> User field
+SYNCED_CLAIMS = {
+    'email': 'email',
+    'name': 'name',
+    'picture': 'profile_picture',
+}
+
+
+def diff_claims(user, decoded_token):
+    """Return {field: value} for claims that differ from the user row"""
+    changes = {}
+    for claim, field in SYNCED_CLAIMS.items():
+        value = decoded_token.get(claim, '')
+        if value and getattr(user, field) != value:
+            changes[field] = value
+    return changes
+
+
+class ProfileSyncQueue:
+    """
+    Collects profile changes per user and applies them off the request path.
+
+    Changes for the same user are coalesced, so a burst of parallel requests
+    results in a single narrow ``UPDATE`` of only the changed columns.
+    """
+
+    def __init__(self, interval=5):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def record(self, user, changes):
+        """Queue changes for a user and apply them to the in-memory instance"""
+        if not changes:
+            return
+        for field, value in changes.items():
+            setattr(user, field, value)
+        if self.interval <= 0:
+            self._apply(user.pk, changes)
+            return
+        with self._lock:
+            self._pending.setdefault(user.pk, {}).update(changes)
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def pending_count(self):
+        """Number of users with unsynced changes"""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Apply all pending changes now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for user_id, changes in pending.items():
+            self._apply(user_id, changes)
+        return len(pending)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def _apply(self, user_id, changes):
+        from .models import User
+        try:
+            User.objects.filter(pk=user_id).update(**changes)
+        except DatabaseError as e:
+            logger.warning('Profile sync failed for user %s: %s', user_id, e)
+
+
+profile_sync = ProfileSyncQueue(interval=settings.PROFILE_SYNC_INTERVAL)
+atexit.register(profile_sync.flush)
@@ -0,0 +1,200 @@
+"""
+Local store of Firebase ID token signing keys
+
+Google publishes the X.509 certificates used to sign Firebase ID tokens as
+a JSON object of ``{kid: pem}``. The store loads them once at startup,
+refreshes them in a background thread before the ``Cache-Control`` max-age
+runs out, and verifies RS256 tokens locally so no request ever waits on a
+certificate fetch.
+"""
+import json
+import logging
+import re
+import threading
+import time
+import urllib.request
+
+import jwt
+from cryptography import x509
+from django.conf import settings
+from firebase_admin import auth
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = (
+    'https://www.googleapis.com/robot/v1/metadata/x509/'
+    'securetoken@system.gserviceaccount.com'
+)
+ISSUER_PREFIX = 'https://securetoken.google.com/'
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class HttpCertSource:
+    """Fetch certificates over HTTP, honouring the Cache-Control max-age"""
+
+    def __init__(self, url=GOOGLE_CERTS_URL, timeout=5, default_max_age=3600):
+        self.url = url
+        self.timeout = timeout
+        self.default_max_age = default_max_age
+
+    def fetch(self):
+        """Return ({kid: pem}, max_age_seconds)"""
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            certs = json.loads(response.read().decode('utf-8'))
+            match = MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else self.default_max_age
+        return certs, max_age
+
+
+class FileCertSource:
+    """Read certificates from a local JSON file"""
+
+    def __init__(self, path, max_age=3600):
+        self.path = path
+        self.max_age = max_age
+
+    def fetch(self):
+        """Return ({kid: pem}, max_age_seconds)"""
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f), self.max_age
+
+
+class SigningKeyStore:
+    """
+    Holds the current Firebase signing keys and verifies ID tokens locally.
+
+    Refreshes are scheduled at ``refresh_ratio`` of the certificate max-age,
+    so new keys are in place before the old response would have expired.
+    A token signed with an unknown ``kid`` triggers one rate-limited
+    refresh to pick up a key rotation early.
+    """
+
+    def __init__(self, source, project_id=None, refresh_ratio=0.8,
+                 retry_interval=30, clock_skew_seconds=0):
+        self.source = source
+        self.project_id = project_id
+        self.refresh_ratio = refresh_ratio
+        self.retry_interval = retry_interval
+        self.clock_skew_seconds = clock_skew_seconds
+        self._keys = {}
+        self._last_refresh = 0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def is_ready(self):
+        """True when keys are loaded and a project id is known"""
+        return bool(self.project_id and self._keys)
+
+    def refresh(self):
+        """Fetch the certificates and swap in the new key set"""
+        certs, max_age = self.source.fetch()
+        keys = {
+            kid: x509.load_pem_x509_certificate(pem.encode('utf-8')).public_key()
+            for kid, pem in certs.items()
+        }
+        with self._lock:
+            self._keys = keys
+            self._last_refresh = time.time()
+        logger.info('Loaded %d Firebase signing keys (max-age %ss)', len(keys), max_age)
+        return max_age
+
+    def start(self):
+        """Preload the keys and keep them fresh in the background"""
+        try:
+            max_age = self.refresh()
+            delay = max(max_age * self.refresh_ratio, self.retry_interval)
+        except Exception as e:
+            logger.warning('Failed to load Firebase signing keys: %s', e)
+            delay = self.retry_interval
+        self._schedule(delay)
+
+    def stop(self):
+        """Cancel the background refresh"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule(self, delay):
+        self.stop()
+        self._timer = threading.Timer(delay, self.start)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _get_key(self, kid):
+        key = self._keys.get(kid)
+        if key is None and time.time() - self._last_refresh > self.retry_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning('Failed to refresh Firebase signing keys: %s', e)
+            key = self._keys.get(kid)
+        return key
+
+    def verify(self, id_token):
+        """
+        Verify an ID token and return its claims with ``uid`` set.
+
+        Raises the same firebase_admin exceptions as ``auth.verify_id_token``.
+        """
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except jwt.PyJWTError as e:
+            raise auth.InvalidIdTokenError(f'Malformed Firebase ID token: {e}', cause=e)
+
+        if header.get('alg') != 'RS256':
+            raise auth.InvalidIdTokenError('Firebase ID token has incorrect algorithm')
+
+        key = self._get_key(header.get('kid'))
+        if key is None:
+            raise auth.InvalidIdTokenError('Firebase ID token has an unknown "kid" claim')
+
+        try:
+            claims = jwt.decode(
+                id_token,
+                key=key,
+                algorithms=['RS256'],
+                audience=self.project_id,
+                issuer=ISSUER_PREFIX + self.project_id,
+                leeway=self.clock_skew_seconds,
+                options={'require': ['exp', 'iat', 'sub']},
+            )
+        except jwt.ExpiredSignatureError as e:
+            raise auth.ExpiredIdTokenError('Firebase ID token has expired', e)
+        except jwt.PyJWTError as e:
+            raise auth.InvalidIdTokenError(f'Invalid Firebase ID token: {e}', cause=e)
+
+        subject = claims.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise auth.InvalidIdTokenError('Firebase ID token has an invalid "sub" claim')
+        if claims.get('auth_time', 0) > time.time() + self.clock_skew_seconds:
+            raise auth.InvalidIdTokenError('Firebase ID token has a future "auth_time" claim')
+
+        claims['uid'] = subject
+        return claims
+
+
+def get_project_id():
+    """Resolve the Firebase project id from settings or the credentials file"""
+    project_id = settings.FIREBASE_PROJECT_ID
+    if project_id:
+        return project_id
+    try:
+        with open(settings.FIREBASE_CONFIG_PATH, encoding='utf-8') as f:
+            return json.load(f).get('project_id', '')
+    except (OSError, ValueError):
+        return ''
+
+
+def build_cert_source():
+    """Create the certificate source configured in settings"""
+    certs_file = settings.FIREBASE_CERTS_FILE
+    if certs_file:
+        return FileCertSource(certs_file)
+    return HttpCertSource(settings.FIREBASE_CERTS_URL)
+
+
+signing_key_store = SigningKeyStore(
+    build_cert_source(),
+    project_id=get_project_id(),
+)
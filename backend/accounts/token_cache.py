@@ -0,0 +1,102 @@
+"""
+In-process cache of verified Firebase ID tokens
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache mapping a token hash to its decoded claims and user id.
+
+    Entries expire at the token's own ``exp`` claim, so a cached token is
+    never accepted for longer than Firebase would accept it.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(id_token):
+        """Hash the raw token so it is never held in memory as a dict key"""
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def get(self, id_token):
+        """Return (claims, user_id) for a cached token or None"""
+        key = self.make_key(id_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims, user_id
+
+    def set(self, id_token, claims, user_id):
+        """Store a verified token until its ``exp`` claim"""
+        if self.maxsize <= 0:
+            return
+        expires_at = claims.get('exp')
+        if not expires_at or expires_at <= time.time():
+            return
+        key = self.make_key(id_token)
+        with self._lock:
+            self._entries[key] = (claims, user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, id_token):
+        """Remove a single token from the cache"""
+        key = self.make_key(id_token)
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        """Drop every cached token belonging to a user"""
+        with self._lock:
+            stale = [
+                key for key, (_, cached_user_id, _) in self._entries.items()
+                if cached_user_id == user_id
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        """Empty the cache and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return cache counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+token_cache = VerifiedTokenCache(
+    maxsize=settings.FIREBASE_TOKEN_CACHE_SIZE
+)
@@ -12,4 +12,5 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('managers/', views.ManagerListCreateView.as_view(), name='manager-list'),
     path('managers/<int:pk>/', views.ManagerDetailView.as_view(), name='manager-detail'),
+    path('token-cache/', views.token_cache_stats, name='token-cache-stats'),
 ]
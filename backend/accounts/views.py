@@ -8,6 +8,7 @@ from rest_framework.views import APIView
 from .models import User
 from .serializers import UserSerializer, UserProfileSerializer, ManagerSerializer
 from .permissions import IsAdmin
+from .token_cache import token_cache
 
 
 class AuthVerifyView(APIView):
@@ -74,3 +75,13 @@ def logout_view(request):
         'success': True,
         'message': 'Logged out successfully'
     })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsAdmin])
+def token_cache_stats(request):
+    """Verified-token cache counters for this worker (Admin only)"""
+    return Response({
+        'success': True,
+        'token_cache': token_cache.stats()
+    })
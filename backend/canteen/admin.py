@@ -3,7 +3,7 @@ Admin configuration for canteen app
 """
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Canteen, Category, MenuItem
+from .models import Canteen, Category, MenuItem, PickupSlot
 
 
 class CategoryInline(admin.TabularInline):
@@ -32,6 +32,7 @@ class CanteenAdmin(admin.ModelAdmin):
     fieldsets = (
         (None, {'fields': ('name', 'description', 'location', 'image')}),
         ('Operating Hours', {'fields': ('opening_time', 'closing_time')}),
+        ('Pickup Slots', {'fields': ('pickup_slot_minutes', 'pickup_slot_capacity')}),
         ('UPI Payment Details', {'fields': ('upi_id', 'upi_name')}),
         ('Status', {'fields': ('is_active',)}),
     )
@@ -95,3 +96,14 @@ class MenuItemAdmin(admin.ModelAdmin):
             obj.get_food_type_display()
         )
     food_type_display.short_description = 'Food Type'
+
+
+@admin.register(PickupSlot)
+class PickupSlotAdmin(admin.ModelAdmin):
+    """Admin for PickupSlot model"""
+    
+    list_display = ['canteen', 'starts_at', 'load', 'capacity']
+    list_filter = ['canteen']
+    list_editable = ['capacity']
+    readonly_fields = ['load']
+    date_hierarchy = 'starts_at'
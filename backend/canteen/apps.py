@@ -8,3 +8,6 @@ class CanteenConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'canteen'
     verbose_name = 'Canteen Management'
+
+    def ready(self):
+        from . import signals  # noqa: F401
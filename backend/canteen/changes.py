@@ -0,0 +1,126 @@
+"""
+Per-canteen menu versioning for incremental client sync
+
+Every Category or MenuItem write bumps ``Canteen.menu_version`` and logs a
+MenuChange row under the new version. Clients remember the last version
+they saw and ask for ``?since=<version>``. They get back only the rows
+that changed, plus tombstones for rows that were deleted or deactivated.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import Canteen, Category, MenuChange, MenuItem
+from .serializers import CategoryListSerializer, MenuItemSerializer
+
+
+def record_menu_change(canteen_id, object_type, object_id, is_tombstone=False):
+    """Bump the canteen's menu version and log the change under it"""
+    return record_menu_changes(canteen_id, [(object_type, object_id, is_tombstone)])
+
+
+def record_menu_changes(canteen_id, changes):
+    """
+    Log several ``(object_type, object_id, is_tombstone)`` changes at once.
+
+    The version moves by ``len(changes)`` in one UPDATE and the rows are
+    written with one INSERT. Returns the new version.
+    """
+    if not changes:
+        return None
+    with transaction.atomic():
+        # The UPDATE row-locks the canteen, so versions commit in order
+        updated = Canteen.objects.filter(pk=canteen_id).update(
+            menu_version=F('menu_version') + len(changes)
+        )
+        if not updated:
+            return None
+        version = Canteen.objects.filter(pk=canteen_id).values_list(
+            'menu_version', flat=True
+        ).get()
+        retention = settings.MENU_CHANGE_RETENTION
+        if len(changes) > retention:
+            # Every client is now past the log's reach and will refetch the
+            # full menu, so the rows would never be read
+            return version
+
+        first = version - len(changes) + 1
+        MenuChange.objects.bulk_create([
+            MenuChange(
+                canteen_id=canteen_id,
+                version=first + offset,
+                object_type=object_type,
+                object_id=object_id,
+                is_tombstone=is_tombstone,
+            )
+            for offset, (object_type, object_id, is_tombstone) in enumerate(changes)
+        ])
+
+        # Prune whenever the version crosses a multiple of 100
+        if version // 100 != (first - 1) // 100 and version > retention:
+            MenuChange.objects.filter(
+                canteen_id=canteen_id,
+                version__lte=version - retention
+            ).delete()
+    return version
+
+
+def get_menu_changes(canteen_id, since):
+    """
+    Return the menu delta after version ``since``, or None for an unknown canteen.
+
+    ``reset`` is set when the log no longer reaches back to ``since`` and
+    the client has to refetch the full menu.
+    """
+    current = Canteen.objects.filter(pk=canteen_id, is_active=True).values_list(
+        'menu_version', flat=True
+    ).first()
+    if current is None:
+        return None
+
+    delta = {
+        'version': current,
+        'since': since,
+        'reset': False,
+        'categories': [],
+        'items': [],
+        'deleted': {'categories': [], 'items': []},
+    }
+    if since == current:
+        return delta
+    if since > current or since < current - settings.MENU_CHANGE_RETENTION:
+        delta['reset'] = True
+        return delta
+
+    # Only the latest change per object matters
+    latest = {}
+    changes = MenuChange.objects.filter(
+        canteen_id=canteen_id,
+        version__gt=since,
+        version__lte=current
+    ).values_list('object_type', 'object_id', 'is_tombstone')
+    for object_type, object_id, is_tombstone in changes:
+        latest[(object_type, object_id)] = is_tombstone
+
+    live = {MenuChange.ObjectType.CATEGORY: [], MenuChange.ObjectType.ITEM: []}
+    for (object_type, object_id), is_tombstone in latest.items():
+        if is_tombstone:
+            key = 'categories' if object_type == MenuChange.ObjectType.CATEGORY else 'items'
+            delta['deleted'][key].append(object_id)
+        else:
+            live[object_type].append(object_id)
+
+    if live[MenuChange.ObjectType.CATEGORY]:
+        categories = Category.objects.filter(
+            pk__in=live[MenuChange.ObjectType.CATEGORY],
+            canteen_id=canteen_id,
+            is_active=True
+        )
+        delta['categories'] = CategoryListSerializer(categories, many=True).data
+    if live[MenuChange.ObjectType.ITEM]:
+        items = MenuItem.objects.filter(
+            pk__in=live[MenuChange.ObjectType.ITEM],
+            canteen_id=canteen_id,
+            is_active=True
+        ).select_related('category')
+        delta['items'] = MenuItemSerializer(items, many=True).data
+    return delta
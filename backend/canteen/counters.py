@@ -0,0 +1,97 @@
+"""
+Denormalized available item counters
+
+``Canteen.available_items_count`` and ``Category.available_items_count``
+hold the number of active and available menu items, so listings don't run
+a COUNT per row. Item saves and deletes adjust them through signals, in
+the same transaction as the row change (see ``MenuItem.save``). Bulk
+writes bypass signals and must call ``apply_counted_changes`` themselves,
+or ``recompute_item_counts`` when the previous states are unknown.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import Canteen, Category, MenuItem
+
+
+def apply_counted_change(old, new):
+    """
+    Move an item's contribution from ``old`` to ``new``.
+
+    Both are ``MenuItem.counted_state`` values: None when the item is not
+    counted, else its ``(canteen_id, category_id)``.
+    """
+    apply_counted_changes([(old, new)])
+
+
+def apply_counted_changes(changes):
+    """Apply many ``(old, new)`` moves with one UPDATE per affected row"""
+    deltas = {Canteen: defaultdict(int), Category: defaultdict(int)}
+    for old, new in changes:
+        if old == new:
+            continue
+        for state, delta in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            canteen_id, category_id = state
+            deltas[Canteen][canteen_id] += delta
+            if category_id is not None:
+                deltas[Category][category_id] += delta
+    if not any(deltas[Canteen].values()) and not any(deltas[Category].values()):
+        return
+
+    with transaction.atomic():
+        for model, by_pk in deltas.items():
+            # Sorted so concurrent writers lock rows in the same order
+            for pk, delta in sorted(by_pk.items()):
+                if delta:
+                    model.objects.filter(pk=pk).update(
+                        available_items_count=Greatest(F('available_items_count') + delta, 0)
+                    )
+
+
+def _count_subquery(**filters):
+    counts = MenuItem.objects.filter(
+        is_active=True,
+        is_available=True,
+        **filters
+    ).order_by().values(*filters).annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def recompute_item_counts(canteen_ids=None):
+    """Recount counters from the menu items; returns (canteens, categories) updated"""
+    canteens = Canteen.objects.all()
+    categories = Category.objects.all()
+    if canteen_ids is not None:
+        canteens = canteens.filter(pk__in=canteen_ids)
+        categories = categories.filter(canteen_id__in=canteen_ids)
+
+    with transaction.atomic():
+        updated_canteens = canteens.update(
+            available_items_count=_count_subquery(canteen_id=OuterRef('pk'))
+        )
+        updated_categories = categories.update(
+            available_items_count=_count_subquery(category_id=OuterRef('pk'))
+        )
+    return updated_canteens, updated_categories
+
+
+def find_drift(canteen_ids=None):
+    """Rows whose stored counter disagrees with the menu items"""
+    canteens = Canteen.objects.all()
+    categories = Category.objects.all()
+    if canteen_ids is not None:
+        canteens = canteens.filter(pk__in=canteen_ids)
+        categories = categories.filter(canteen_id__in=canteen_ids)
+
+    available = Q(menu_items__is_active=True, menu_items__is_available=True)
+    canteens = canteens.annotate(actual=Count('menu_items', filter=available))
+    available = Q(items__is_active=True, items__is_available=True)
+    categories = categories.annotate(actual=Count('items', filter=available))
+    return (
+        [c for c in canteens if c.actual != c.available_items_count],
+        [c for c in categories if c.actual != c.available_items_count],
+    )
@@ -0,0 +1,211 @@
+"""
+Resized variants of uploaded canteen, category and menu item images
+
+Each upload is decoded once with Pillow and written out as a fixed set of
+sizes in WebP and JPEG. Filenames carry a hash of their content, so they
+can be cached forever. The result is stored on the row's
+``image_variants`` as::
+
+    {'source': <image name>, 'thumbnail': {'webp': <name>, 'jpeg': <name>}, ...}
+
+Builds run on a small thread pool after the upload's transaction commits.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> longest edge in pixels
+VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'detail': 1080,
+}
+
+# Format -> (extension, Pillow save options)
+FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def render_variant(image, size, fmt):
+    """Encode ``image`` shrunk to fit ``size`` pixels; returns bytes"""
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    if fmt == 'jpeg' or variant.mode not in ('RGB', 'RGBA'):
+        has_alpha = variant.mode in ('RGBA', 'LA') or 'transparency' in variant.info
+        variant = variant.convert('RGBA' if has_alpha and fmt == 'webp' else 'RGB')
+
+    buffer = io.BytesIO()
+    variant.save(buffer, **FORMATS[fmt][1])
+    return buffer.getvalue()
+
+
+def variant_name(source_name, variant, content, fmt):
+    """``<dir>/variants/<stem>.<variant>.<hash>.<ext>`` for a rendered variant"""
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return os.path.join(directory, 'variants', f'{stem}.{variant}.{digest}.{FORMATS[fmt][0]}')
+
+
+def render_variants(field_file):
+    """Render every variant of an image file; returns the ``image_variants`` map"""
+    storage = field_file.storage
+    with field_file.open('rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    variants = {'source': field_file.name}
+    for variant, size in VARIANTS.items():
+        variants[variant] = {}
+        for fmt in FORMATS:
+            content = render_variant(image, size, fmt)
+            name = variant_name(field_file.name, variant, content, fmt)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(content))
+            variants[variant][fmt] = name
+    return variants
+
+
+def variant_files(variants):
+    return [
+        name
+        for variant in VARIANTS
+        for name in (variants or {}).get(variant, {}).values()
+    ]
+
+
+def delete_variant_files(storage, variants, keep=()):
+    for name in variant_files(variants):
+        if name not in keep:
+            storage.delete(name)
+
+
+def build_image_variants(model, pk):
+    """
+    Render variants for the row's current image and store them.
+
+    The row is only updated if its image is still the one that was
+    rendered, so a slow build can't overwrite a newer upload's variants.
+    """
+    from .changes import record_menu_change
+    from .models import Canteen
+    from .signals import object_type_for
+    from .snapshot import invalidate_menu_snapshot
+
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return None
+
+    try:
+        variants = render_variants(instance.image)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning('Could not build variants for %s %s: %s', model.__name__, pk, e)
+        return None
+
+    storage = instance.image.storage
+    updated = model.objects.filter(pk=pk, image=instance.image.name).update(
+        image_variants=variants,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        delete_variant_files(storage, variants)
+        return None
+    delete_variant_files(storage, instance.image_variants, keep=variant_files(variants))
+
+    # .update() skips the signals that keep menu caches and the sync log current
+    canteen_id = instance.pk if model is Canteen else instance.canteen_id
+    invalidate_menu_snapshot(canteen_id)
+    if model is not Canteen:
+        record_menu_change(canteen_id, object_type_for(model), instance.pk, not instance.is_active)
+    return variants
+
+
+class VariantBuilder:
+    """Runs variant builds on a thread pool, or inline with no workers"""
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._executor = None
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    def submit(self, model, pk):
+        """Build variants once the current transaction commits"""
+        transaction.on_commit(lambda: self._dispatch(model, pk))
+
+    def _dispatch(self, model, pk):
+        if self.workers <= 0:
+            build_image_variants(model, pk)
+            return
+        with self._lock:
+            # A queued build reads the row when it runs, so repeats are redundant
+            if (model, pk) in self._queued:
+                return
+            self._queued.add((model, pk))
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='image-variants'
+                )
+        self._executor.submit(self._build_in_background, model, pk)
+
+    def _build_in_background(self, model, pk):
+        with self._lock:
+            self._queued.discard((model, pk))
+        try:
+            build_image_variants(model, pk)
+        except Exception:
+            logger.exception('Variant build failed for %s %s', model.__name__, pk)
+        finally:
+            connection.close()
+
+
+variant_builder = VariantBuilder(workers=settings.IMAGE_VARIANT_WORKERS)
+
+
+def image_changed(instance):
+    """Whether the row's image differs from the one its variants were built from"""
+    return (instance.image.name or '') != (instance.image_variants or {}).get('source', '')
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only ``{variant: {format: url}}`` map for a model's image.
+
+    Empty until the variants are built; clients fall back to ``image``.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', '*')
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        variants = instance.image_variants or {}
+        if not instance.image or variants.get('source') != instance.image.name:
+            return {}
+
+        storage = instance.image.storage
+        request = self.context.get('request')
+        urls = {}
+        for variant in VARIANTS:
+            urls[variant] = {}
+            for fmt, name in variants.get(variant, {}).items():
+                url = storage.url(name)
+                urls[variant][fmt] = request.build_absolute_uri(url) if request else url
+        return urls
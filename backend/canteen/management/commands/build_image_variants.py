@@ -0,0 +1,35 @@
+"""
+Management command to build resized variants for existing images
+"""
+from django.core.management.base import BaseCommand
+from canteen.images import build_image_variants, image_changed
+from canteen.models import Canteen, Category, MenuItem
+
+
+class Command(BaseCommand):
+    help = 'Build resized image variants for canteens, categories and menu items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Rebuild variants that are already up to date'
+        )
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        for model in (Canteen, Category, MenuItem):
+            rows = model.objects.exclude(image='').exclude(image__isnull=True).only(
+                'pk', 'image', 'image_variants'
+            )
+            for row in rows.iterator():
+                if not options['rebuild'] and not image_changed(row):
+                    continue
+                if build_image_variants(model, row.pk) is None:
+                    failed += 1
+                    self.stdout.write(f'  {model.__name__} {row.pk}: {row.image.name} failed')
+                else:
+                    built += 1
+
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f'Built variants for {built} images, {failed} failed'))
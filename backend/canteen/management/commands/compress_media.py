@@ -0,0 +1,28 @@
+"""
+Management command to precompress media files for MediaFilesMiddleware
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from whitenoise.compress import Compressor
+
+
+class Command(BaseCommand):
+    help = 'Write .br/.gz siblings for compressible files under MEDIA_ROOT'
+
+    def handle(self, *args, **options):
+        # Skips already-compressed formats such as JPEG and WebP
+        compressor = Compressor(quiet=True)
+        compressed = 0
+        for root, _, files in os.walk(settings.MEDIA_ROOT):
+            for filename in files:
+                path = os.path.join(root, filename)
+                if not compressor.should_compress(filename):
+                    continue
+                if any(os.path.exists(path + suffix) for suffix in ('.br', '.gz')):
+                    continue
+                if compressor.compress(path):
+                    compressed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Compressed {compressed} media files'))
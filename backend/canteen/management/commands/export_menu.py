@@ -0,0 +1,91 @@
+"""
+Management command to export canteen menus to CSV or JSON Lines
+"""
+from django.core.management.base import BaseCommand, CommandError
+from canteen.menu_io import write_records
+from canteen.models import Canteen, Category, MenuItem
+
+
+def iter_menu_records(canteens):
+    """Yield category then item records for each canteen, without loading whole menus"""
+    for canteen in canteens:
+        categories = Category.objects.filter(canteen=canteen).order_by(
+            'display_order', 'name'
+        ).values_list('name', 'description', 'display_order', 'is_active')
+        for name, description, display_order, is_active in categories.iterator():
+            yield {
+                'type': 'category',
+                'canteen': canteen.name,
+                'name': name,
+                'description': description,
+                'display_order': display_order,
+                'is_active': is_active,
+            }
+
+        items = MenuItem.objects.filter(canteen=canteen).order_by(
+            'display_order', 'name'
+        ).values(
+            'name', 'category__name', 'description', 'price', 'food_type',
+            'is_available', 'is_active', 'prep_time', 'display_order'
+        )
+        for item in items.iterator(chunk_size=2000):
+            item['type'] = 'item'
+            item['canteen'] = canteen.name
+            item['category'] = item.pop('category__name') or ''
+            item['price'] = str(item['price'])
+            yield item
+
+
+class Command(BaseCommand):
+    help = 'Export canteen categories and menu items to CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='Output file, or - for stdout'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Output format (defaults to the file extension, else jsonl)'
+        )
+        parser.add_argument(
+            '--canteen',
+            type=int,
+            action='append',
+            dest='canteens',
+            help='Only export this canteen id (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+
+        canteens = Canteen.objects.order_by('name', 'id').only('id', 'name')
+        if options['canteens']:
+            canteens = canteens.filter(pk__in=options['canteens'])
+        canteens = list(canteens)
+
+        names = [canteen.name for canteen in canteens]
+        duplicated = sorted({name for name in names if names.count(name) > 1})
+        if duplicated:
+            raise CommandError(
+                f'Canteen names must be unique to export by name: {", ".join(duplicated)}'
+            )
+
+        if path == '-':
+            count = write_records(self.stdout, iter_menu_records(canteens), file_format)
+            self.stderr.write(f'Exported {count} records')
+            return
+
+        try:
+            f = open(path, 'w', encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f'Cannot open "{path}": {e}')
+        with f:
+            count = write_records(f, iter_menu_records(canteens), file_format)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Exported {count} records from {len(canteens)} canteens to {path}')
+        )
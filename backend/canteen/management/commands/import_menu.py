@@ -0,0 +1,238 @@
+"""
+Management command to import canteen menus from CSV or JSON Lines
+"""
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from canteen.changes import record_menu_changes
+from canteen.counters import apply_counted_changes
+from canteen.menu_io import (
+    CATEGORY_FIELDS, ITEM_FIELDS, RecordError, parse_record, read_records
+)
+from canteen.models import Canteen, Category, MenuChange, MenuItem
+from canteen.snapshot import invalidate_menu_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Upsert canteen categories and menu items from an export_menu file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='File written by export_menu (CSV or JSON Lines)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Input format (defaults to the file extension, else jsonl)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows upserted per statement'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print what would change and roll everything back'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        self.dry_run = options['dry_run']
+        self.show_diff = self.dry_run or options['verbosity'] >= 2
+
+        try:
+            f = open(path, encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f'Cannot open "{path}": {e}')
+
+        canteens = {}
+        for pk, name in Canteen.objects.values_list('pk', 'name'):
+            # Duplicated names can't be resolved, so they map to None
+            canteens[name] = None if name in canteens else pk
+        self.canteens = canteens
+        self.canteen_names = {pk: name for name, pk in canteens.items() if pk is not None}
+        self.category_ids = {}
+        self.loaded_canteens = set()
+        self.logged = {}
+        self.stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
+
+        started = time.monotonic()
+        with f, transaction.atomic():
+            records = read_records(f, file_format)
+            try:
+                while True:
+                    batch = list(islice(records, batch_size))
+                    if not batch:
+                        break
+                    self.import_batch(batch)
+            except RecordError as e:
+                raise CommandError(str(e))
+
+            for canteen_id, entries in self.logged.items():
+                record_menu_changes(canteen_id, entries)
+                transaction.on_commit(
+                    lambda canteen_id=canteen_id: invalidate_menu_snapshot(canteen_id)
+                )
+            if self.dry_run:
+                transaction.set_rollback(True)
+
+        elapsed = time.monotonic() - started
+        stats = self.stats
+        summary = (
+            f'{stats["created"]} created, {stats["updated"]} updated, '
+            f'{stats["unchanged"]} unchanged, {stats["errors"]} rejected in {elapsed:.1f}s'
+        )
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING(f'Dry run, nothing saved: {summary}'))
+        else:
+            style = self.style.WARNING if stats['errors'] else self.style.SUCCESS
+            self.stdout.write(style(f'Imported menu: {summary}'))
+
+    def reject(self, line_num, message):
+        self.stats['errors'] += 1
+        self.stderr.write(f'  line {line_num}: {message}')
+
+    def import_batch(self, batch):
+        """Validate and upsert one batch of records"""
+        categories = {}
+        items = {}
+        for line_num, record in batch:
+            try:
+                record_type, canteen, name, fields = parse_record(record)
+            except RecordError as e:
+                self.reject(line_num, str(e))
+                continue
+            canteen_id = self.canteens.get(canteen)
+            if canteen_id is None:
+                problem = 'is ambiguous' if canteen in self.canteens else 'does not exist'
+                self.reject(line_num, f'canteen "{canteen}" {problem}')
+                continue
+            # Later records for the same row win
+            rows = categories if record_type == 'category' else items
+            rows[(canteen_id, name)] = (line_num, fields)
+
+        if categories:
+            self.upsert_categories(categories)
+        if items:
+            self.upsert_items(items)
+
+    def existing_rows(self, model, keys, fields):
+        """Current values of rows by natural key"""
+        canteen_ids = {canteen_id for canteen_id, _ in keys}
+        names = {name for _, name in keys}
+        rows = model.objects.filter(canteen_id__in=canteen_ids, name__in=names).values(
+            'pk', 'canteen_id', 'name', *fields
+        )
+        return {(row['canteen_id'], row['name']): row for row in rows}
+
+    def diff(self, label, key, current, fields):
+        """Changed fields as {field: (old, new)}; None for a new row"""
+        row = f'{label} {self.canteen_names[key[0]]} / {key[1]}'
+        if current is None:
+            if self.show_diff:
+                self.stdout.write(f'+ {row}')
+            return None
+        changed = {
+            field: (current[field], value)
+            for field, value in fields.items()
+            if current[field] != value
+        }
+        if changed and self.show_diff:
+            details = ', '.join(f'{field}: {old!r} -> {new!r}' for field, (old, new) in changed.items())
+            self.stdout.write(f'~ {row}: {details}')
+        return changed
+
+    def upsert(self, model, rows, fields, label):
+        """
+        Write new and changed rows with one INSERT ... ON CONFLICT.
+
+        Returns ``{key: (pk, previous values or None, new values)}`` for the
+        rows written.
+        """
+        existing = self.existing_rows(model, rows, fields)
+        written = {}
+        for key, (line_num, values) in rows.items():
+            current = existing.get(key)
+            changed = self.diff(label, key, current, values)
+            if changed == {}:
+                self.stats['unchanged'] += 1
+                continue
+            self.stats['created' if current is None else 'updated'] += 1
+            written[key] = (current, values)
+
+        if not written:
+            return written
+        now = timezone.now()
+        model.objects.bulk_create(
+            [
+                model(canteen_id=canteen_id, name=name, updated_at=now, **values)
+                for (canteen_id, name), (_, values) in written.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['canteen', 'name'],
+            update_fields=[*fields, 'updated_at'],
+        )
+
+        created = [key for key, (current, _) in written.items() if current is None]
+        ids = self.existing_rows(model, created, []) if created else {}
+        return {
+            key: (current['pk'] if current else ids[key]['pk'], current, values)
+            for key, (current, values) in written.items()
+        }
+
+    def upsert_categories(self, rows):
+        written = self.upsert(Category, rows, CATEGORY_FIELDS, 'category')
+        for (canteen_id, name), (pk, _, values) in written.items():
+            self.category_ids[(canteen_id, name)] = pk
+            self.logged.setdefault(canteen_id, []).append(
+                (MenuChange.ObjectType.CATEGORY, pk, not values['is_active'])
+            )
+
+    def category_id(self, canteen_id, name):
+        if name is None:
+            return None
+        if canteen_id not in self.loaded_canteens:
+            self.loaded_canteens.add(canteen_id)
+            for pk, category_name in Category.objects.filter(canteen_id=canteen_id).values_list(
+                'pk', 'name'
+            ):
+                self.category_ids.setdefault((canteen_id, category_name), pk)
+        return self.category_ids.get((canteen_id, name), False)
+
+    def upsert_items(self, rows):
+        resolved = {}
+        for key, (line_num, values) in rows.items():
+            category_id = self.category_id(key[0], values['category'])
+            if category_id is False:
+                self.reject(line_num, f'category "{values["category"]}" does not exist')
+                continue
+            values = {**values, 'category_id': category_id}
+            del values['category']
+            resolved[key] = (line_num, values)
+
+        fields = ['category_id' if field == 'category' else field for field in ITEM_FIELDS]
+        written = self.upsert(MenuItem, resolved, fields, 'item')
+
+        counted = []
+        for (canteen_id, name), (pk, current, values) in written.items():
+            old_state = None
+            if current and current['is_active'] and current['is_available']:
+                old_state = (canteen_id, current['category_id'])
+            new_state = None
+            if values['is_active'] and values['is_available']:
+                new_state = (canteen_id, values['category_id'])
+            counted.append((old_state, new_state))
+            self.logged.setdefault(canteen_id, []).append(
+                (MenuChange.ObjectType.ITEM, pk, not values['is_active'])
+            )
+        # bulk_create skips the signals that keep the counters current
+        apply_counted_changes(counted)
@@ -0,0 +1,51 @@
+"""
+Management command to recompute the denormalized available item counters
+"""
+from django.core.management.base import BaseCommand
+from canteen.counters import find_drift, recompute_item_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute available item counters on canteens and categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--canteen',
+            type=int,
+            action='append',
+            dest='canteens',
+            help='Only recompute this canteen (repeatable)'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Report drifted counters without fixing them'
+        )
+
+    def handle(self, *args, **options):
+        canteen_ids = options['canteens']
+        canteens, categories = find_drift(canteen_ids)
+
+        for canteen in canteens:
+            self.stdout.write(
+                f'  canteen {canteen.pk} ({canteen.name}): '
+                f'{canteen.available_items_count} -> {canteen.actual}'
+            )
+        for category in categories:
+            self.stdout.write(
+                f'  category {category.pk} ({category.name}): '
+                f'{category.available_items_count} -> {category.actual}'
+            )
+
+        if options['check']:
+            drifted = len(canteens) + len(categories)
+            style = self.style.WARNING if drifted else self.style.SUCCESS
+            self.stdout.write(style(f'{drifted} counters out of date'))
+            return
+
+        updated_canteens, updated_categories = recompute_item_counts(canteen_ids)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Recomputed {updated_canteens} canteens and {updated_categories} categories'
+            )
+        )
@@ -0,0 +1,148 @@
+"""
+Menu export/import records for the export_menu and import_menu commands
+
+A menu file is a stream of records, one per category or menu item, as CSV
+rows or JSON Lines. Rows are identified by their natural key,
+``(canteen name, row name)``. A canteen's categories come before its items
+so an import can resolve item categories as it streams.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from .models import MenuItem
+
+COLUMNS = [
+    'type', 'canteen', 'name', 'category', 'description', 'price',
+    'food_type', 'is_available', 'is_active', 'prep_time', 'display_order',
+]
+
+CATEGORY_FIELDS = ['description', 'display_order', 'is_active']
+ITEM_FIELDS = [
+    'category', 'description', 'price', 'food_type',
+    'is_available', 'is_active', 'prep_time', 'display_order',
+]
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'f', ''}
+
+
+class RecordError(ValueError):
+    """A record that can't be imported"""
+
+
+def write_records(f, records, file_format):
+    """Write records to ``f`` as CSV or JSON Lines; returns the count"""
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    else:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            count += 1
+    return count
+
+
+def read_records(f, file_format):
+    """Stream ``(line number, record)`` pairs out of a menu file"""
+    if file_format == 'csv':
+        reader = csv.DictReader(f)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_num, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise RecordError(f'line {line_num}: invalid JSON ({e.msg})')
+        if not isinstance(record, dict):
+            raise RecordError(f'line {line_num}: expected an object')
+        yield line_num, record
+
+
+def _text(record, key, max_length=None, required=False):
+    value = record.get(key)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RecordError(f'{key} is required')
+    if max_length and len(value) > max_length:
+        raise RecordError(f'{key} is longer than {max_length} characters')
+    return value
+
+
+def _bool(record, key, default):
+    value = record.get(key)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RecordError(f'{key} must be true or false')
+
+
+def _int(record, key, default):
+    value = record.get(key)
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise RecordError(f'{key} must be a whole number')
+    if value < 0:
+        raise RecordError(f'{key} must not be negative')
+    return value
+
+
+def parse_record(record):
+    """
+    Validate a raw record into ``(type, canteen, name, fields)``.
+
+    ``fields`` holds CATEGORY_FIELDS or ITEM_FIELDS; an item's
+    ``category`` is still the category name at this point.
+    """
+    record_type = _text(record, 'type', required=True).lower()
+    canteen = _text(record, 'canteen', required=True)
+
+    if record_type == 'category':
+        name = _text(record, 'name', max_length=100, required=True)
+        return record_type, canteen, name, {
+            'description': _text(record, 'description'),
+            'display_order': _int(record, 'display_order', 0),
+            'is_active': _bool(record, 'is_active', True),
+        }
+
+    if record_type != 'item':
+        raise RecordError(f'unknown type "{record_type}"')
+
+    name = _text(record, 'name', max_length=255, required=True)
+    try:
+        price = Decimal(_text(record, 'price', required=True))
+    except InvalidOperation:
+        raise RecordError('price must be a number')
+    if not price.is_finite() or price < 0 or price >= Decimal('1e8'):
+        raise RecordError('price is out of range')
+    price = price.quantize(Decimal('0.01'))
+
+    food_type = _text(record, 'food_type') or MenuItem.FoodType.VEG
+    if food_type not in MenuItem.FoodType.values:
+        raise RecordError(f'food_type must be one of {", ".join(MenuItem.FoodType.values)}')
+
+    return record_type, canteen, name, {
+        'category': _text(record, 'category') or None,
+        'description': _text(record, 'description'),
+        'price': price,
+        'food_type': food_type,
+        'is_available': _bool(record, 'is_available', True),
+        'is_active': _bool(record, 'is_active', True),
+        'prep_time': _int(record, 'prep_time', 10),
+        'display_order': _int(record, 'display_order', 0),
+    }
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canteen', '0002_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='canteen',
+            name='menu_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='MenuChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField()),
+                ('object_type', models.CharField(choices=[('category', 'Category'), ('item', 'Menu Item')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('is_tombstone', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('canteen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='menu_changes', to='canteen.canteen')),
+            ],
+            options={
+                'ordering': ['version'],
+                'unique_together': {('canteen', 'version')},
+            },
+        ),
+    ]
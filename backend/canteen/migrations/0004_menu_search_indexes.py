@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+# Keep the tsvector expression in sync with canteen.search.DOCUMENT_SQL
+FORWARD_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    (
+        'CREATE INDEX IF NOT EXISTS canteen_menuitem_search_gin ON canteen_menuitem '
+        "USING gin (to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, '')))"
+    ),
+    (
+        'CREATE INDEX IF NOT EXISTS canteen_menuitem_name_trgm ON canteen_menuitem '
+        'USING gin (name gin_trgm_ops)'
+    ),
+]
+
+REVERSE_SQL = [
+    'DROP INDEX IF EXISTS canteen_menuitem_name_trgm',
+    'DROP INDEX IF EXISTS canteen_menuitem_search_gin',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # Other databases search through the in-process index instead
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canteen', '0003_menu_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD_SQL), run(REVERSE_SQL)),
+    ]
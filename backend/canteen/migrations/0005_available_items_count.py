@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Canteen = apps.get_model('canteen', 'Canteen')
+    Category = apps.get_model('canteen', 'Category')
+    MenuItem = apps.get_model('canteen', 'MenuItem')
+    available = MenuItem.objects.filter(is_active=True, is_available=True).order_by()
+
+    def count(field):
+        counts = available.filter(**{field: OuterRef('pk')}).values(field).annotate(
+            count=Count('id')
+        ).values('count')
+        return Coalesce(Subquery(counts), Value(0))
+
+    Canteen.objects.update(available_items_count=count('canteen_id'))
+    Category.objects.update(available_items_count=count('category_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canteen', '0004_menu_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='canteen',
+            name='available_items_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='available_items_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicates(apps, schema_editor):
+    # Keep the oldest item's name; later duplicates get their id appended,
+    # plus a counter if an item is already called that
+    MenuItem = apps.get_model('canteen', 'MenuItem')
+    duplicated = (
+        MenuItem.objects.values('canteen_id', 'name')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for row in duplicated:
+        items = MenuItem.objects.filter(
+            canteen_id=row['canteen_id'],
+            name=row['name']
+        ).order_by('id')
+        for item in items[1:]:
+            base, attempt = item.name, 1
+            while True:
+                suffix = f' ({item.pk})' if attempt == 1 else f' ({item.pk}-{attempt})'
+                name = base[:255 - len(suffix)] + suffix
+                if not MenuItem.objects.filter(canteen_id=item.canteen_id, name=name).exists():
+                    break
+                attempt += 1
+            item.name = name
+            item.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canteen', '0006_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='menuitem',
+            constraint=models.UniqueConstraint(fields=('canteen', 'name'), name='unique_menu_item_name_per_canteen'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canteen', '0007_menu_item_natural_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='stock_quantity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
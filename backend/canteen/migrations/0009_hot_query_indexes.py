@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:28
+
+from django.db import migrations, models
+from dp_canteen.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('canteen', '0008_menuitem_stock_quantity'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_available', True)), fields=['canteen', 'display_order', 'name'], name='menuitem_available_order_idx'),
+        ),
+    ]
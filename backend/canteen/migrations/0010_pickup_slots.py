@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canteen', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='canteen',
+            name='pickup_slot_capacity',
+            field=models.PositiveIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='canteen',
+            name='pickup_slot_minutes',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PickupSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('capacity', models.PositiveIntegerField(blank=True, null=True)),
+                ('load', models.PositiveIntegerField(default=0)),
+                ('canteen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pickup_slots', to='canteen.canteen')),
+            ],
+            options={
+                'ordering': ['starts_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pickupslot',
+            constraint=models.UniqueConstraint(fields=('canteen', 'starts_at'), name='unique_pickup_slot'),
+        ),
+    ]
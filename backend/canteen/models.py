@@ -1,7 +1,7 @@
 """
 Models for canteen app
 """
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -12,16 +12,30 @@ class Canteen(models.Model):
     description = models.TextField(blank=True)
     location = models.CharField(max_length=255, blank=True)
     image = models.ImageField(upload_to='canteens/', blank=True, null=True)
+    # Resized copies of image, built by canteen.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     # Operating hours
     opening_time = models.TimeField(default='08:00')
     closing_time = models.TimeField(default='20:00')
     
+    # Pickup slots (see canteen.slots); empty length means orders aren't slotted
+    pickup_slot_minutes = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Prep-minutes of orders the kitchen can take per slot
+    pickup_slot_capacity = models.PositiveIntegerField(default=60)
+    
     # UPI details for payment
     upi_id = models.CharField(max_length=255, blank=True)
     upi_name = models.CharField(max_length=255, blank=True)
     
     is_active = models.BooleanField(default=True)
+    
+    # Bumped on every category or menu item change, see MenuChange
+    menu_version = models.PositiveBigIntegerField(default=0, editable=False)
+    
+    # Active and available menu items, maintained by canteen.counters
+    available_items_count = models.PositiveIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -49,9 +63,16 @@ class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    # Resized copies of image, built by canteen.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     display_order = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     
+    # Active and available menu items, maintained by canteen.counters
+    available_items_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
     class Meta:
         verbose_name_plural = 'Categories'
         ordering = ['display_order', 'name']
@@ -61,6 +82,9 @@ class Category(models.Model):
         return f"{self.name} ({self.canteen.name})"
 
 
+COUNTED_FIELDS = {'canteen_id', 'category_id', 'is_active', 'is_available'}
+
+
 class MenuItem(models.Model):
     """Menu item model"""
     
@@ -86,6 +110,8 @@ class MenuItem(models.Model):
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='menu_items/', blank=True, null=True)
+    # Resized copies of image, built by canteen.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     food_type = models.CharField(
         max_length=10,
@@ -97,6 +123,9 @@ class MenuItem(models.Model):
     is_available = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
     
+    # Units left; empty means stock is not tracked (see canteen.stock)
+    stock_quantity = models.PositiveIntegerField(null=True, blank=True)
+    
     # Preparation time in minutes
     prep_time = models.PositiveIntegerField(default=10)
     
@@ -108,6 +137,101 @@ class MenuItem(models.Model):
     
     class Meta:
         ordering = ['display_order', 'name']
+        constraints = [
+            # Natural key used by the menu import/export commands
+            models.UniqueConstraint(
+                fields=['canteen', 'name'],
+                name='unique_menu_item_name_per_canteen'
+            ),
+        ]
+        indexes = [
+            # The public menu: a canteen's orderable items in display order
+            models.Index(
+                fields=['canteen', 'display_order', 'name'],
+                condition=models.Q(is_active=True, is_available=True),
+                name='menuitem_available_order_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} - ₹{self.price}"
+    
+    def save(self, *args, **kwargs):
+        # The post_save handlers adjust the available item counters; run them
+        # in the save's transaction so both commit or neither does (deletes
+        # already send post_delete inside theirs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the counters saw, so saves only apply the difference
+        if not instance.get_deferred_fields() & COUNTED_FIELDS:
+            instance._counted_state = instance.counted_state
+        return instance
+    
+    @property
+    def is_counted(self):
+        """Whether this item is included in the available item counters"""
+        return self.is_active and self.is_available
+    
+    @property
+    def counted_state(self):
+        if not self.is_counted:
+            return None
+        return self.canteen_id, self.category_id
+
+
+class MenuChange(models.Model):
+    """Log of menu changes per canteen, used for incremental client sync"""
+    
+    class ObjectType(models.TextChoices):
+        CATEGORY = 'category', 'Category'
+        ITEM = 'item', 'Menu Item'
+    
+    canteen = models.ForeignKey(
+        Canteen,
+        on_delete=models.CASCADE,
+        related_name='menu_changes'
+    )
+    version = models.PositiveBigIntegerField()
+    object_type = models.CharField(max_length=10, choices=ObjectType.choices)
+    object_id = models.PositiveBigIntegerField()
+    
+    # Deleted or deactivated rows are sent to clients as tombstones
+    is_tombstone = models.BooleanField(default=False)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['version']
+        unique_together = ['canteen', 'version']
+    
+    def __str__(self):
+        return f"{self.canteen_id} v{self.version}: {self.object_type} {self.object_id}"
+
+
+class PickupSlot(models.Model):
+    """Prep-minutes booked into one pickup slot of a canteen"""
+    
+    canteen = models.ForeignKey(
+        Canteen,
+        on_delete=models.CASCADE,
+        related_name='pickup_slots'
+    )
+    starts_at = models.DateTimeField()
+    
+    # Overrides the canteen's pickup_slot_capacity for this slot only;
+    # empty follows the canteen's current value
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    load = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['starts_at']
+        constraints = [
+            models.UniqueConstraint(fields=['canteen', 'starts_at'], name='unique_pickup_slot'),
+        ]
+    
+    def __str__(self):
+        return f"{self.canteen_id} {timezone.localtime(self.starts_at):%Y-%m-%d %H:%M}: {self.load}/{self.capacity or '-'}"
@@ -0,0 +1,269 @@
+"""
+Menu item search and autocomplete
+
+On PostgreSQL, items are matched with full-text search backed by a GIN
+index (see migration 0004). Typos are tolerated through the pg_trgm ``%``
+operator on the item name, which uses the trigram GIN index; similarity
+itself is only computed to rank the matches. Other databases use an in-process inverted
+index with trigram fuzzy matching. That index is rebuilt per canteen
+whenever ``Canteen.menu_version`` moves.
+"""
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from .models import Canteen, MenuItem
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Must match the expression indexed in migration 0004
+DOCUMENT_SQL = (
+    "to_tsvector('simple', coalesce(\"canteen_menuitem\".\"name\", '') || ' ' || "
+    "coalesce(\"canteen_menuitem\".\"description\", ''))"
+)
+TRIGRAM_THRESHOLD = 0.3
+
+
+def tokenize(text):
+    """Lowercase, accent-folded word tokens"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return TOKEN_RE.findall(text.lower())
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def searchable_items(canteen_id, available_only=True):
+    items = MenuItem.objects.filter(canteen_id=canteen_id, is_active=True)
+    if available_only:
+        items = items.filter(is_available=True)
+    return items
+
+
+class MenuSearchIndex:
+    """Inverted index over one canteen's menu with prefix and trigram lookup"""
+
+    NAME_WEIGHT = 2.0
+    DESCRIPTION_WEIGHT = 1.0
+    PREFIX_FACTOR = 0.8
+    FUZZY_FACTOR = 0.6
+
+    def __init__(self, items):
+        self.postings = defaultdict(dict)
+        self.name_postings = defaultdict(set)
+        self.grams = defaultdict(set)
+        self.items = {}
+        self.unavailable = set()
+
+        for item_id, name, description, display_order, is_available in items:
+            self.items[item_id] = (display_order, name.lower(), name)
+            if not is_available:
+                self.unavailable.add(item_id)
+            for token in tokenize(description):
+                self.postings[token][item_id] = self.DESCRIPTION_WEIGHT
+            for token in tokenize(name):
+                self.postings[token][item_id] = self.NAME_WEIGHT
+                self.name_postings[token].add(item_id)
+
+        for token in self.postings:
+            for gram in trigrams(token):
+                self.grams[gram].add(token)
+        self.vocabulary = sorted(self.postings)
+        self.name_vocabulary = sorted(self.name_postings)
+
+    def _prefixed(self, vocabulary, prefix):
+        start = bisect_left(vocabulary, prefix)
+        for token in vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def _fuzzy(self, term):
+        term_grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in term_grams:
+            for token in self.grams.get(gram, ()):
+                shared[token] += 1
+        for token, count in shared.items():
+            similarity = count / (len(term_grams) + len(trigrams(token)) - count)
+            if similarity >= TRIGRAM_THRESHOLD:
+                yield token, similarity
+
+    def _order(self, item_id):
+        display_order, lowered, _ = self.items[item_id]
+        return display_order, lowered
+
+    def search(self, query, limit=50, available_only=True):
+        """Return item ids ranked by relevance"""
+        terms = tokenize(query)
+        scores = defaultdict(float)
+
+        for position, term in enumerate(terms):
+            matches = {}
+            if term in self.postings:
+                matches[term] = 1.0
+            # The last term may still be being typed
+            if position == len(terms) - 1:
+                for token in self._prefixed(self.vocabulary, term):
+                    matches.setdefault(token, self.PREFIX_FACTOR)
+            if not matches:
+                for token, similarity in self._fuzzy(term):
+                    matches[token] = self.FUZZY_FACTOR * similarity
+
+            best = {}
+            for token, factor in matches.items():
+                for item_id, weight in self.postings[token].items():
+                    best[item_id] = max(best.get(item_id, 0), weight * factor)
+            for item_id, score in best.items():
+                if not (available_only and item_id in self.unavailable):
+                    scores[item_id] += score
+
+        ranked = sorted(scores, key=lambda item_id: (-scores[item_id], self._order(item_id)))
+        return ranked[:limit]
+
+    def autocomplete(self, prefix, limit=10, available_only=True):
+        """Return item ids whose names match the typed prefix"""
+        terms = tokenize(prefix)
+        if not terms:
+            return []
+
+        candidates = None
+        for term in terms[:-1]:
+            ids = self.name_postings.get(term, set())
+            candidates = ids if candidates is None else candidates & ids
+        prefixed = set()
+        for token in self._prefixed(self.name_vocabulary, terms[-1]):
+            prefixed |= self.name_postings[token]
+        candidates = prefixed if candidates is None else candidates & prefixed
+        if available_only:
+            candidates -= self.unavailable
+
+        typed = prefix.strip().lower()
+        return sorted(
+            candidates,
+            key=lambda item_id: (not self.items[item_id][1].startswith(typed), self._order(item_id))
+        )[:limit]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(canteen_id):
+    """Return the in-process index for a canteen, rebuilding it if the menu changed"""
+    version = Canteen.objects.filter(pk=canteen_id).values_list('menu_version', flat=True).first()
+    with _indexes_lock:
+        cached = _indexes.get(canteen_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    # Unavailable items are indexed too, for searches that list them
+    index = MenuSearchIndex(
+        searchable_items(canteen_id, available_only=False).values_list(
+            'id', 'name', 'description', 'display_order', 'is_available'
+        )
+    )
+    with _indexes_lock:
+        _indexes[canteen_id] = (version, index)
+    return index
+
+
+def _document():
+    from django.contrib.postgres.search import SearchVectorField
+    return RawSQL(DOCUMENT_SQL, [], output_field=SearchVectorField())
+
+
+def ranked_matches(queryset, query):
+    """PostgreSQL only: the items of ``queryset`` matching ``query``, best first"""
+    from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+    search_query = SearchQuery(query, config='simple', search_type='websearch')
+    # name % query uses the trigram index; its cut-off is pg_trgm.similarity_threshold,
+    # 0.3 by default like TRIGRAM_THRESHOLD
+    return (
+        queryset
+        .annotate(document=_document())
+        .filter(Q(document=search_query) | Q(name__trigram_similar=query))
+        .annotate(rank=SearchRank(F('document'), search_query) + TrigramSimilarity('name', query))
+        .order_by('-rank', 'display_order', 'name')
+    )
+
+
+def search_menu_item_ids(canteen_id, query, limit=50):
+    """Ranked ids of available items in a canteen matching ``query``"""
+    if not tokenize(query):
+        return []
+    if connection.vendor != 'postgresql':
+        return get_search_index(canteen_id).search(query, limit)
+    return list(ranked_matches(searchable_items(canteen_id), query).values_list('id', flat=True)[:limit])
+
+
+def autocomplete_menu_items(canteen_id, prefix, limit=10):
+    """Names of available items matching a partially typed query"""
+    terms = tokenize(prefix)
+    if not terms:
+        return []
+
+    if connection.vendor != 'postgresql':
+        index = get_search_index(canteen_id)
+        return [
+            {'id': item_id, 'name': index.items[item_id][2]}
+            for item_id in index.autocomplete(prefix, limit)
+        ]
+
+    from django.contrib.postgres.search import SearchQuery
+    # Tokens are \w+ only, so they are safe to splice into a raw tsquery
+    search_query = SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms),
+        config='simple',
+        search_type='raw'
+    )
+    return list(
+        searchable_items(canteen_id)
+        .annotate(document=_document())
+        .filter(document=search_query)
+        .annotate(starts=Case(
+            When(name__istartswith=prefix.strip(), then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()
+        ))
+        .order_by('starts', 'display_order', 'name')
+        .values('id', 'name')[:limit]
+    )
+
+
+def order_by_ids(queryset, ids):
+    """Filter a queryset to ``ids`` and keep their order"""
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(
+        Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+             output_field=IntegerField())
+    )
+
+
+class MenuSearchFilter(filters.BaseFilterBackend):
+    """
+    Ranked ``?search=`` for menu item lists, backed by the menu search index.
+
+    Only ranks; which items are listed (unavailable ones included, for
+    staff views) is left to the view's queryset.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not tokenize(query):
+            return queryset
+        if connection.vendor == 'postgresql':
+            return ranked_matches(queryset, query)
+        ids = get_search_index(view.kwargs['canteen_id']).search(query, limit=None, available_only=False)
+        return order_by_ids(queryset, ids)
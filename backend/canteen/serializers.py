@@ -2,6 +2,7 @@
 Serializers for canteen app
 """
 from rest_framework import serializers
+from .images import ImageVariantsField
 from .models import Canteen, Category, MenuItem
 
 
@@ -9,46 +10,52 @@ class MenuItemSerializer(serializers.ModelSerializer):
     """Serializer for MenuItem model"""
     
     category_name = serializers.CharField(source='category.name', read_only=True)
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = MenuItem
         fields = [
             'id', 'canteen', 'category', 'category_name', 'name', 
-            'description', 'price', 'image', 'food_type', 
-            'is_available', 'is_active', 'prep_time', 'display_order'
+            'description', 'price', 'image', 'image_variants', 'food_type', 
+            'is_available', 'is_active', 'stock_quantity', 'prep_time', 'display_order'
         ]
         read_only_fields = ['id']
+    
+    def validate(self, attrs):
+        # An item that has run out can't be ordered, so it isn't available
+        if attrs.get('stock_quantity') == 0:
+            attrs['is_available'] = False
+        return attrs
 
 
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model"""
     
     items = MenuItemSerializer(many=True, read_only=True)
-    items_count = serializers.SerializerMethodField()
+    items_count = serializers.IntegerField(source='available_items_count', read_only=True)
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = Category
         fields = [
-            'id', 'canteen', 'name', 'description', 'image',
+            'id', 'canteen', 'name', 'description', 'image', 'image_variants',
             'display_order', 'is_active', 'items', 'items_count'
         ]
         read_only_fields = ['id']
-    
-    def get_items_count(self, obj):
-        return obj.items.filter(is_active=True, is_available=True).count()
 
 
 class CategoryListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for category list"""
     
-    items_count = serializers.SerializerMethodField()
+    items_count = serializers.IntegerField(source='available_items_count', read_only=True)
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'image', 'display_order', 'items_count']
-    
-    def get_items_count(self, obj):
-        return obj.items.filter(is_active=True, is_available=True).count()
+        fields = [
+            'id', 'name', 'description', 'image', 'image_variants',
+            'display_order', 'items_count'
+        ]
 
 
 class CanteenSerializer(serializers.ModelSerializer):
@@ -56,30 +63,70 @@ class CanteenSerializer(serializers.ModelSerializer):
     
     categories = CategoryListSerializer(many=True, read_only=True)
     is_open = serializers.BooleanField(read_only=True)
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = Canteen
         fields = [
-            'id', 'name', 'description', 'location', 'image',
-            'opening_time', 'closing_time', 'upi_id', 'upi_name',
-            'is_active', 'is_open', 'categories'
+            'id', 'name', 'description', 'location', 'image', 'image_variants',
+            'opening_time', 'closing_time', 'pickup_slot_minutes',
+            'pickup_slot_capacity', 'upi_id', 'upi_name',
+            'is_active', 'is_open', 'menu_version', 'categories'
         ]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'menu_version']
 
 
 class CanteenListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for canteen list"""
     
     is_open = serializers.BooleanField(read_only=True)
-    menu_items_count = serializers.SerializerMethodField()
+    menu_items_count = serializers.IntegerField(source='available_items_count', read_only=True)
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = Canteen
         fields = [
-            'id', 'name', 'description', 'location', 'image',
-            'opening_time', 'closing_time', 'is_active', 'is_open',
-            'menu_items_count'
+            'id', 'name', 'description', 'location', 'image', 'image_variants',
+            'opening_time', 'closing_time', 'pickup_slot_minutes',
+            'is_active', 'is_open', 'menu_items_count'
         ]
+
+
+class MenuItemBulkChangeSerializer(serializers.Serializer):
+    """Serializer for one item's changes in a bulk menu update"""
+    
+    id = serializers.IntegerField()
+    is_available = serializers.BooleanField(required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    display_order = serializers.IntegerField(min_value=0, required=False)
+    stock_quantity = serializers.IntegerField(min_value=0, allow_null=True, required=False)
+    
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError("No changes given for this item")
+        return attrs
+
+
+class MenuItemBulkUpdateSerializer(serializers.Serializer):
+    """Serializer for bulk menu updates"""
+    
+    items = MenuItemBulkChangeSerializer(many=True, max_length=500)
+    
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one item is required")
+        ids = [change['id'] for change in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each item may only appear once")
+        return value
+
+
+class PickupSlotSerializer(serializers.Serializer):
+    """Serializer for a pickup slot's availability"""
     
-    def get_menu_items_count(self, obj):
-        return obj.menu_items.filter(is_active=True, is_available=True).count()
+    starts_at = serializers.DateTimeField()
+    ends_at = serializers.DateTimeField()
+    capacity = serializers.IntegerField()
+    load = serializers.IntegerField()
+    remaining = serializers.IntegerField()
+    available = serializers.BooleanField()
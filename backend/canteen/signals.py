@@ -0,0 +1,106 @@
+"""
+Signal handlers for canteen app
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .changes import record_menu_change
+from .counters import apply_counted_change
+from .images import delete_variant_files, image_changed, variant_builder
+from .models import Canteen, Category, MenuChange, MenuItem
+from .snapshot import invalidate_menu_snapshot
+
+
+@receiver(post_save, sender=Canteen)
+@receiver(post_delete, sender=Canteen)
+def canteen_changed(sender, instance, **kwargs):
+    # After commit, or a read in between could cache the old menu under
+    # the new generation
+    canteen_id = instance.pk
+    transaction.on_commit(lambda: invalidate_menu_snapshot(canteen_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def menu_changed(sender, instance, **kwargs):
+    canteen_id = instance.canteen_id
+    transaction.on_commit(lambda: invalidate_menu_snapshot(canteen_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=MenuItem)
+def log_menu_save(sender, instance, **kwargs):
+    record_menu_change(
+        instance.canteen_id,
+        object_type_for(sender),
+        instance.pk,
+        is_tombstone=not instance.is_active
+    )
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=MenuItem)
+def log_menu_delete(sender, instance, origin=None, **kwargs):
+    # Rows removed by deleting their canteen take the whole log with them
+    if isinstance(origin, Canteen) or getattr(origin, 'model', None) is Canteen:
+        return
+    record_menu_change(
+        instance.canteen_id,
+        object_type_for(sender),
+        instance.pk,
+        is_tombstone=True
+    )
+
+
+@receiver(pre_save, sender=MenuItem)
+def load_counted_state(sender, instance, **kwargs):
+    # Instances not loaded through from_db (or with deferred fields) have to
+    # look up what the counters currently include
+    if hasattr(instance, '_counted_state'):
+        return
+    previous = None
+    if instance.pk is not None:
+        previous = MenuItem.objects.filter(pk=instance.pk).only(
+            'canteen_id', 'category_id', 'is_active', 'is_available'
+        ).first()
+    instance._counted_state = previous.counted_state if previous else None
+
+
+@receiver(post_save, sender=MenuItem)
+def update_item_counters(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    state = instance.counted_state
+    apply_counted_change(instance._counted_state, state)
+    instance._counted_state = state
+
+
+@receiver(post_delete, sender=MenuItem)
+def release_item_counters(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Canteen) or getattr(origin, 'model', None) is Canteen:
+        return
+    state = getattr(instance, '_counted_state', instance.counted_state)
+    apply_counted_change(state, None)
+
+
+@receiver(post_save, sender=Canteen)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=MenuItem)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or not image_changed(instance):
+        return
+    if instance.image:
+        variant_builder.submit(sender, instance.pk)
+        return
+    # Image removed
+    sender.objects.filter(pk=instance.pk).update(image_variants={})
+    delete_variant_files(instance.image.storage, instance.image_variants)
+    instance.image_variants = {}
+
+
+def object_type_for(model):
+    if model is Category:
+        return MenuChange.ObjectType.CATEGORY
+    return MenuChange.ObjectType.ITEM
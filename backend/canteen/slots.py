@@ -0,0 +1,146 @@
+"""
+Pickup slot scheduling
+
+Canteens with a ``pickup_slot_minutes`` split their opening hours into
+pickup slots. Each slot takes orders up to its capacity in prep-minutes (the
+sum of ``prep_time`` times quantity of an order's items), so a rush spreads
+over the slots around it instead of landing on the kitchen at once. A slot's
+capacity is the canteen's ``pickup_slot_capacity`` at booking time, unless
+the slot has its own ``capacity`` set in the admin.
+
+Booking is a conditional ``UPDATE ... WHERE load + minutes <= capacity``,
+like stock reservation, so concurrent orders can't overfill a slot. A slot
+row is only created when its first order books it. Availability shown to
+clients is read from a per-day table of slot loads that is cached for a
+few seconds and dropped whenever a booking commits. It is advisory; the
+booking itself always checks the database.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import PickupSlot
+
+# Slots can be booked for today and this many following days
+DAYS_AHEAD = 1
+
+
+def booking_days():
+    today = timezone.localdate()
+    return [today + timedelta(days=n) for n in range(DAYS_AHEAD + 1)]
+
+
+def slot_starts(canteen, day):
+    """Start times of the canteen's pickup slots on ``day``"""
+    length = timedelta(minutes=canteen.pickup_slot_minutes)
+    start = timezone.make_aware(datetime.combine(day, canteen.opening_time))
+    closes = timezone.make_aware(datetime.combine(day, canteen.closing_time))
+    starts = []
+    while start + length <= closes:
+        starts.append(start)
+        start += length
+    return starts
+
+
+def is_slot_start(canteen, starts_at):
+    """Whether ``starts_at`` is a bookable slot of the canteen"""
+    day = timezone.localtime(starts_at).date()
+    return (
+        day in booking_days()
+        and starts_at > timezone.now()
+        and starts_at in slot_starts(canteen, day)
+    )
+
+
+def loads_key(canteen_id, day):
+    return f'pickup_slot_loads:{canteen_id}:{day.isoformat()}'
+
+
+def invalidate_slot_loads(canteen_id, day):
+    cache.delete(loads_key(canteen_id, day))
+
+
+def slot_loads(canteen_id, day):
+    """``{starts_at: (load, capacity override or None)}`` of the slots booked on ``day``"""
+    key = loads_key(canteen_id, day)
+    loads = cache.get(key)
+    if loads is None:
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        slots = PickupSlot.objects.filter(
+            canteen_id=canteen_id,
+            starts_at__gte=start,
+            starts_at__lt=start + timedelta(days=1)
+        ).values_list('starts_at', 'load', 'capacity')
+        loads = {starts_at: (load, capacity) for starts_at, load, capacity in slots}
+        cache.set(key, loads, settings.PICKUP_SLOT_CACHE_TTL)
+    return loads
+
+
+def available_slots(canteen, day, minutes=1):
+    """
+    The canteen's slots on ``day`` that haven't started, with their free prep-minutes.
+
+    ``available`` tells whether an order of ``minutes`` prep-minutes would
+    be booked into the slot.
+    """
+    loads = slot_loads(canteen.pk, day)
+    length = timedelta(minutes=canteen.pickup_slot_minutes)
+    now = timezone.now()
+    slots = []
+    for starts_at in slot_starts(canteen, day):
+        if starts_at <= now:
+            continue
+        load, capacity = loads.get(starts_at, (0, None))
+        if capacity is None:
+            capacity = canteen.pickup_slot_capacity
+        slots.append({
+            'starts_at': starts_at,
+            'ends_at': starts_at + length,
+            'capacity': capacity,
+            'load': load,
+            'remaining': max(capacity - load, 0),
+            'available': fits(load, capacity, minutes),
+        })
+    return slots
+
+
+def fits(load, capacity, minutes):
+    # An empty slot takes any order, so orders bigger than a slot can still be placed
+    return load == 0 or load + minutes <= capacity
+
+
+def reserve_slot(canteen, starts_at, minutes):
+    """Book ``minutes`` of prep into a slot; the PickupSlot, or None if it is full"""
+    slot, _ = PickupSlot.objects.get_or_create(canteen=canteen, starts_at=starts_at)
+    capacity = Coalesce(F('capacity'), Value(canteen.pickup_slot_capacity))
+    reserved = PickupSlot.objects.filter(
+        Q(load=0) | Q(load__lte=capacity - minutes),
+        pk=slot.pk
+    ).update(load=F('load') + minutes)
+    if not reserved:
+        return None
+    day = timezone.localtime(starts_at).date()
+    transaction.on_commit(lambda: invalidate_slot_loads(canteen.pk, day))
+    return slot
+
+
+def reserve_earliest_slot(canteen, minutes):
+    """Book the earliest slot with room for ``minutes``; None if all are full"""
+    for day in booking_days():
+        for slot in available_slots(canteen, day, minutes):
+            if slot['available']:
+                reserved = reserve_slot(canteen, slot['starts_at'], minutes)
+                if reserved is not None:
+                    return reserved
+    return None
+
+
+def release_slot(slot, minutes):
+    """Free ``minutes`` of a cancelled order's prep in its slot"""
+    PickupSlot.objects.filter(pk=slot.pk, load__gte=minutes).update(load=F('load') - minutes)
+    day = timezone.localtime(slot.starts_at).date()
+    transaction.on_commit(lambda: invalidate_slot_loads(slot.canteen_id, day))
@@ -0,0 +1,118 @@
+"""
+Precomputed per-canteen menu documents
+
+The whole active menu of a canteen (canteen fields, categories and items)
+is serialized once and kept in the cache. Any change to a Canteen,
+Category or MenuItem row bumps the canteen's snapshot generation once its
+transaction commits, so the next read rebuilds it; every other read is a
+cache hit. A rebuild that read the menu before the commit is stored under
+the old generation and never served after the bump.
+
+Image URLs are absolute, as in the live canteen and menu endpoints, so a
+document is kept per origin (scheme and host) it was requested on.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+from .images import ImageVariantsField
+from .models import Canteen, Category, MenuItem
+from .serializers import MenuItemSerializer
+
+
+def generation_key(canteen_id):
+    return f'menu_snapshot_gen:{canteen_id}'
+
+
+def snapshot_key(canteen_id, generation, origin=''):
+    return f'menu_snapshot:{canteen_id}:{generation}:{origin}'
+
+
+def invalidate_menu_snapshot(canteen_id):
+    """Force the next read to rebuild the canteen's menu document"""
+    key = generation_key(canteen_id)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def build_menu_snapshot(canteen_id, request=None):
+    """
+    Serialize the active menu of a canteen; returns None if it doesn't exist.
+
+    URLs are built absolute from ``request``, if given, as serializers do.
+    """
+    canteen = Canteen.objects.filter(pk=canteen_id, is_active=True).first()
+    if canteen is None:
+        return None
+
+    categories = list(Category.objects.filter(canteen_id=canteen_id, is_active=True))
+    items = MenuItem.objects.filter(
+        Q(category__isnull=True) | Q(category__is_active=True),
+        canteen_id=canteen_id,
+        is_active=True
+    ).select_related('category')
+
+    context = {'request': request}
+
+    def image_url(instance):
+        if not instance.image:
+            return None
+        url = instance.image.url
+        return request.build_absolute_uri(url) if request else url
+
+    variants_field = ImageVariantsField()
+    variants_field.bind('image_variants', serializers.Serializer(context=context))
+    image_variants = variants_field.to_representation
+    by_category = {category.id: [] for category in categories}
+    uncategorized = []
+    for item in MenuItemSerializer(items, many=True, context=context).data:
+        by_category.get(item['category'], uncategorized).append(item)
+
+    return {
+        'canteen': {
+            'id': canteen.id,
+            'name': canteen.name,
+            'description': canteen.description,
+            'location': canteen.location,
+            'image': image_url(canteen),
+            'image_variants': image_variants(canteen),
+            'opening_time': canteen.opening_time.isoformat(),
+            'closing_time': canteen.closing_time.isoformat(),
+            'upi_id': canteen.upi_id,
+            'upi_name': canteen.upi_name,
+            'menu_version': canteen.menu_version,
+        },
+        'categories': [
+            {
+                'id': category.id,
+                'name': category.name,
+                'description': category.description,
+                'image': image_url(category),
+                'image_variants': image_variants(category),
+                'display_order': category.display_order,
+                'items_count': sum(1 for item in by_category[category.id] if item['is_available']),
+                'items': by_category[category.id],
+            }
+            for category in categories
+        ],
+        'uncategorized': uncategorized,
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def get_menu_snapshot(canteen_id, request=None):
+    """Return the cached menu document for the request's origin, building it on a miss"""
+    generation = cache.get(generation_key(canteen_id), 0)
+    origin = request.build_absolute_uri('/') if request else ''
+    key = snapshot_key(canteen_id, generation, origin)
+
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_menu_snapshot(canteen_id, request)
+        if snapshot is not None:
+            cache.set(key, snapshot, settings.MENU_SNAPSHOT_TIMEOUT)
+    return snapshot
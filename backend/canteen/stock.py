@@ -0,0 +1,84 @@
+"""
+Stock tracking for menu items
+
+Items with a ``stock_quantity`` are decremented at order time with a
+conditional ``UPDATE ... WHERE stock_quantity >= qty``, so concurrent
+orders never read-modify-write the row and can't oversell it. Items
+without one (NULL) are not stock-tracked.
+
+The order that takes the last unit marks the item unavailable with a
+second conditional UPDATE. Only that order sees the flip, so only it
+adjusts the menu counters, which commit with it. Only these flips between
+in stock and sold out (and back, on cancellation) are published: they move
+``updated_at`` and, once they commit, the menu version, change log and
+snapshot. Plain count changes aren't, so an order rush doesn't rewrite the
+canteen row or rebuild the menu on every order. The ``stock_quantity``
+shown in menu responses can therefore lag; availability doesn't.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .changes import record_menu_change
+from .counters import apply_counted_change
+from .models import MenuChange, MenuItem
+from .snapshot import invalidate_menu_snapshot
+
+
+def reserve_stock(menu_item, quantity):
+    """Take ``quantity`` units of a tracked item; False if not enough are left"""
+    reserved = MenuItem.objects.filter(
+        pk=menu_item.pk,
+        stock_quantity__gte=quantity
+    ).update(stock_quantity=F('stock_quantity') - quantity)
+    if not reserved:
+        return False
+
+    sold_out = MenuItem.objects.filter(
+        pk=menu_item.pk,
+        stock_quantity=0,
+        is_available=True
+    ).update(is_available=False, updated_at=timezone.now())
+    if sold_out:
+        availability_changed(menu_item, is_available=False)
+    return True
+
+
+def release_stock(menu_item_id, quantity):
+    """Return ``quantity`` units to a tracked item, making it available again if it had sold out"""
+    restocked = MenuItem.objects.filter(
+        pk=menu_item_id,
+        stock_quantity=0,
+        is_available=False
+    ).update(
+        stock_quantity=F('stock_quantity') + quantity,
+        is_available=True,
+        updated_at=timezone.now()
+    )
+    if restocked:
+        menu_item = MenuItem.objects.get(pk=menu_item_id)
+        availability_changed(menu_item, is_available=True)
+        return
+    MenuItem.objects.filter(
+        pk=menu_item_id,
+        stock_quantity__isnull=False
+    ).update(stock_quantity=F('stock_quantity') + quantity)
+
+
+def availability_changed(menu_item, is_available):
+    # The conditional UPDATEs above skip the signals, so do their work here
+    if menu_item.is_active:
+        state = (menu_item.canteen_id, menu_item.category_id)
+        apply_counted_change(None if is_available else state, state if is_available else None)
+    canteen_id, menu_item_id, is_active = menu_item.canteen_id, menu_item.pk, menu_item.is_active
+
+    def publish():
+        # After commit, so the order doesn't hold the row lock the version
+        # bump takes on the canteen until it commits
+        record_menu_change(
+            canteen_id,
+            MenuChange.ObjectType.ITEM,
+            menu_item_id,
+            is_tombstone=not is_active
+        )
+        invalidate_menu_snapshot(canteen_id)
+    transaction.on_commit(publish)
@@ -13,9 +13,15 @@ urlpatterns = [
     path('<int:canteen_id>/categories/', views.CategoryListView.as_view(), name='category-list'),
     path('categories/<int:pk>/', views.CategoryDetailView.as_view(), name='category-detail'),
     path('<int:canteen_id>/menu/', views.MenuItemListView.as_view(), name='menu-list'),
+    path('<int:canteen_id>/menu/snapshot/', views.MenuSnapshotView.as_view(), name='menu-snapshot'),
+    path('<int:canteen_id>/menu/changes/', views.MenuChangesView.as_view(), name='menu-changes'),
+    path('<int:canteen_id>/menu/search/', views.MenuSearchView.as_view(), name='menu-search'),
+    path('<int:canteen_id>/menu/autocomplete/', views.menu_autocomplete, name='menu-autocomplete'),
+    path('<int:canteen_id>/pickup-slots/', views.pickup_slots, name='pickup-slots'),
     path('menu/<int:pk>/', views.MenuItemDetailView.as_view(), name='menu-detail'),
     
     # Manager endpoints
+    path('menu/bulk-update/', views.bulk_update_menu_items, name='menu-bulk-update'),
     path('menu/<int:pk>/update/', views.ManagerMenuItemUpdateView.as_view(), name='menu-update'),
     path('menu/<int:pk>/toggle/', views.toggle_item_availability, name='menu-toggle'),
 ]
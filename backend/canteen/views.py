@@ -1,41 +1,101 @@
 """
 Views for canteen app
 """
+from datetime import date
+
 from rest_framework import generics, permissions, status, filters
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_time
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Canteen, Category, MenuItem
+from .models import Canteen, Category, MenuChange, MenuItem
 from .serializers import (
     CanteenSerializer, CanteenListSerializer,
     CategorySerializer, CategoryListSerializer,
-    MenuItemSerializer
+    MenuItemSerializer, MenuItemBulkUpdateSerializer, PickupSlotSerializer
 )
+from .changes import get_menu_changes, record_menu_changes
+from .counters import apply_counted_changes
+from .search import MenuSearchFilter, autocomplete_menu_items, order_by_ids, search_menu_item_ids
+from .slots import available_slots, booking_days
+from .snapshot import get_menu_snapshot, invalidate_menu_snapshot
 from accounts.permissions import IsAdmin, IsManagerOrAdmin
+from dp_canteen.conditional import ConditionalGetMixin
+from dp_canteen.throttling import throttle_scope
+
+
+# Public menu responses may be cached by clients and reverse proxies briefly
+PUBLIC_CACHE_CONTROL = {'public': True, 'max_age': settings.MENU_CACHE_MAX_AGE}
+
+
+def rows_version(queryset):
+    """(latest updated_at, row count) - changes on any update, insert or delete"""
+    result = queryset.aggregate(latest=Max('updated_at'), count=Count('id'))
+    return result['latest'], result['count']
 
 
-class CanteenListView(generics.ListAPIView):
+def canteen_version(canteen_id):
+    """Version of everything rendered by the canteen detail and snapshot views"""
+    canteen = Canteen.objects.filter(pk=canteen_id, is_active=True).only(
+        'updated_at', 'opening_time', 'closing_time'
+    ).first()
+    if canteen is None:
+        return None
+    return (
+        canteen.updated_at,
+        canteen.is_open,
+        rows_version(Category.objects.filter(canteen_id=canteen_id)),
+        rows_version(MenuItem.objects.filter(canteen_id=canteen_id)),
+    )
+
+
+class CanteenListView(ConditionalGetMixin, generics.ListAPIView):
     """List all active canteens"""
     serializer_class = CanteenListSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'menu'
+    cache_control = PUBLIC_CACHE_CONTROL
     
     def get_queryset(self):
         return Canteen.objects.filter(is_active=True)
+    
+    def get_version(self, request, *args, **kwargs):
+        # Only what the list renders; the item counts are canteen columns
+        # kept by canteen.counters without touching updated_at
+        canteens = self.get_queryset().only(
+            'updated_at', 'opening_time', 'closing_time', 'available_items_count'
+        )
+        return [
+            (canteen.pk, canteen.updated_at, canteen.is_open, canteen.available_items_count)
+            for canteen in canteens
+        ]
 
 
-class CanteenDetailView(generics.RetrieveAPIView):
+class CanteenDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Get canteen details"""
     serializer_class = CanteenSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'menu'
+    cache_control = PUBLIC_CACHE_CONTROL
     
     def get_queryset(self):
         return Canteen.objects.filter(is_active=True)
+    
+    def get_version(self, request, pk):
+        return canteen_version(pk)
 
 
 class CategoryListView(generics.ListAPIView):
     """List categories for a canteen"""
     serializer_class = CategoryListSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'menu'
     
     def get_queryset(self):
         canteen_id = self.kwargs.get('canteen_id')
@@ -45,21 +105,30 @@ class CategoryListView(generics.ListAPIView):
         )
 
 
-class CategoryDetailView(generics.RetrieveAPIView):
+class CategoryDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Get category with its menu items"""
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'menu'
+    cache_control = PUBLIC_CACHE_CONTROL
     
     def get_queryset(self):
         return Category.objects.filter(is_active=True)
+    
+    def get_version(self, request, pk):
+        category = self.get_queryset().filter(pk=pk).values_list('updated_at', flat=True).first()
+        if category is None:
+            return None
+        return category, rows_version(MenuItem.objects.filter(category_id=pk))
 
 
-class MenuItemListView(generics.ListAPIView):
+class MenuItemListView(ConditionalGetMixin, generics.ListAPIView):
     """List menu items for a canteen"""
     serializer_class = MenuItemSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['name', 'description']
+    throttle_scope = 'menu'
+    cache_control = PUBLIC_CACHE_CONTROL
+    filter_backends = [MenuSearchFilter, filters.OrderingFilter]
     ordering_fields = ['price', 'name', 'display_order']
     
     def get_queryset(self):
@@ -81,31 +150,227 @@ class MenuItemListView(generics.ListAPIView):
             queryset = queryset.filter(food_type=food_type)
         
         return queryset
+    
+    def get_version(self, request, canteen_id):
+        # Items carry their category name, so category renames count too
+        return (
+            rows_version(MenuItem.objects.filter(canteen_id=canteen_id)),
+            rows_version(Category.objects.filter(canteen_id=canteen_id)),
+        )
+
+
+class MenuSnapshotView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """Full active menu of a canteen in one cached document"""
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'menu'
+    cache_control = PUBLIC_CACHE_CONTROL
+    
+    def get_snapshot(self, canteen_id):
+        if not hasattr(self, '_snapshot'):
+            self._snapshot = get_menu_snapshot(canteen_id, self.request)
+        return self._snapshot
+    
+    def get_is_open(self, snapshot):
+        # Opening state depends on the current time, so it is never cached
+        canteen = Canteen(
+            opening_time=parse_time(snapshot['canteen']['opening_time']),
+            closing_time=parse_time(snapshot['canteen']['closing_time'])
+        )
+        return canteen.is_open
+    
+    def get_version(self, request, canteen_id):
+        # Derived from the cached document itself so validating costs no query
+        snapshot = self.get_snapshot(canteen_id)
+        if snapshot is None:
+            return None
+        return snapshot['generated_at'], self.get_is_open(snapshot)
+    
+    def retrieve(self, request, canteen_id):
+        snapshot = self.get_snapshot(canteen_id)
+        if snapshot is None:
+            return Response(
+                {'error': 'Canteen not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({
+            **snapshot,
+            'canteen': {**snapshot['canteen'], 'is_open': self.get_is_open(snapshot)},
+        })
+
+
+class MenuChangesView(generics.GenericAPIView):
+    """Menu rows changed since a client's last known menu version"""
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'menu'
+    
+    def get(self, request, canteen_id):
+        try:
+            since = int(request.query_params.get('since', 0))
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'since must be a non-negative integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        delta = get_menu_changes(canteen_id, since)
+        if delta is None:
+            return Response(
+                {'error': 'Canteen not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(delta)
+
+
+class MenuSearchView(generics.ListAPIView):
+    """Ranked, typo-tolerant search over a canteen's available items"""
+    serializer_class = MenuItemSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+    throttle_scope = 'menu'
+    
+    def get_queryset(self):
+        canteen_id = self.kwargs.get('canteen_id')
+        query = self.request.query_params.get('q', '')
+        ids = search_menu_item_ids(canteen_id, query)
+        return order_by_ids(MenuItem.objects.select_related('category'), ids)
+
+
+@throttle_scope('autocomplete')
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def menu_autocomplete(request, canteen_id):
+    """Item name suggestions for search-as-you-type"""
+    prefix = request.query_params.get('q', '')
+    return Response({
+        'query': prefix,
+        'suggestions': autocomplete_menu_items(canteen_id, prefix)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def pickup_slots(request, canteen_id):
+    """
+    Pickup slots of a canteen on ``?date=`` (today by default) and their free prep-minutes.
+    
+    ``?minutes=`` is the order's prep-minutes; slots are ``available`` if
+    an order that size would be booked into them (any room, by default).
+    """
+    canteen = get_object_or_404(Canteen, pk=canteen_id, is_active=True)
+    if not canteen.pickup_slot_minutes:
+        return Response(
+            {'error': 'This canteen does not use pickup slots'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    days = booking_days()
+    day = days[0]
+    if request.query_params.get('date'):
+        try:
+            day = date.fromisoformat(request.query_params['date'])
+        except ValueError:
+            raise ValidationError({'date': 'Use the YYYY-MM-DD format'})
+        if day not in days:
+            raise ValidationError({'date': f'Slots can be booked from {days[0]} to {days[-1]}'})
+    
+    minutes = request.query_params.get('minutes', '1')
+    if not minutes.isdigit() or int(minutes) < 1:
+        raise ValidationError({'minutes': 'Must be a positive number of prep-minutes'})
+    
+    return Response({
+        'canteen': canteen.pk,
+        'date': day,
+        'slot_minutes': canteen.pickup_slot_minutes,
+        'slots': PickupSlotSerializer(available_slots(canteen, day, int(minutes)), many=True).data
+    })
 
 
 class MenuItemDetailView(generics.RetrieveAPIView):
     """Get menu item details"""
     serializer_class = MenuItemSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'menu'
     
     def get_queryset(self):
         return MenuItem.objects.filter(is_active=True)
 
 
 # Manager views for updating menu items
+def managed_menu_items(user):
+    """Menu items the user may change"""
+    if user.is_superuser or user.role == 'admin':
+        return MenuItem.objects.all()
+    # Managers can only update their canteen's items
+    if user.managed_canteen:
+        return MenuItem.objects.filter(canteen=user.managed_canteen)
+    return MenuItem.objects.none()
+
+
 class ManagerMenuItemUpdateView(generics.UpdateAPIView):
     """Update menu item availability (Manager only)"""
     serializer_class = MenuItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsManagerOrAdmin]
     
     def get_queryset(self):
-        user = self.request.user
-        if user.is_superuser or user.role == 'admin':
-            return MenuItem.objects.all()
-        # Managers can only update their canteen's items
-        if user.managed_canteen:
-            return MenuItem.objects.filter(canteen=user.managed_canteen)
-        return MenuItem.objects.none()
+        return managed_menu_items(self.request.user)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsManagerOrAdmin])
+def bulk_update_menu_items(request):
+    """Change availability, price or display order of many items at once"""
+    serializer = MenuItemBulkUpdateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    changes = {change.pop('id'): change for change in serializer.validated_data['items']}
+    
+    with transaction.atomic():
+        items = list(
+            managed_menu_items(request.user)
+            .filter(pk__in=changes)
+            .select_for_update()
+            .prefetch_related('category')
+        )
+        missing = sorted(set(changes) - {item.pk for item in items})
+        if missing:
+            return Response(
+                {'error': 'Menu items not found', 'missing_ids': missing},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        now = timezone.now()
+        fields = {'updated_at'}
+        counted = []
+        logged = {}
+        for item in items:
+            old_state = item.counted_state
+            for field, value in changes[item.pk].items():
+                setattr(item, field, value)
+                fields.add(field)
+            if changes[item.pk].get('stock_quantity') == 0:
+                item.is_available = False
+                fields.add('is_available')
+            item.updated_at = now
+            counted.append((old_state, item.counted_state))
+            logged.setdefault(item.canteen_id, []).append(
+                (MenuChange.ObjectType.ITEM, item.pk, not item.is_active)
+            )
+        
+        # One UPDATE for every row; bulk_update skips the signals, so keep
+        # counters, the change log and the snapshot current here
+        MenuItem.objects.bulk_update(items, sorted(fields))
+        apply_counted_changes(counted)
+        for canteen_id, entries in logged.items():
+            record_menu_changes(canteen_id, entries)
+            transaction.on_commit(lambda canteen_id=canteen_id: invalidate_menu_snapshot(canteen_id))
+    
+    items.sort(key=lambda item: (item.display_order, item.name))
+    return Response({
+        'success': True,
+        'updated': len(items),
+        'items': MenuItemSerializer(items, many=True, context={'request': request}).data
+    })
 
 
 @api_view(['POST'])
@@ -125,7 +390,7 @@ def toggle_item_availability(request, pk):
             )
         
         item.is_available = not item.is_available
-        item.save()
+        item.save(update_fields=['is_available', 'updated_at'])
         
         return Response({
             'success': True,
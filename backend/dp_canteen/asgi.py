@@ -9,3 +9,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dp_canteen.settings')
 
 application = get_asgi_application()
+
+# Preload Firebase signing keys so the first requests don't wait on a fetch
+from django.conf import settings  # noqa: E402
+
+if settings.FIREBASE_LOCAL_VERIFICATION:
+    from accounts.signing_keys import signing_key_store  # noqa: E402
+    signing_key_store.start()
@@ -0,0 +1,48 @@
+"""
+Conditional GET support for read endpoints
+
+Views describe their current state with a cheap version tuple (row
+maxima, counts, version counters) instead of serializing the body. The
+tuple is hashed into an ETag and Django's ``condition`` decorator answers
+``If-None-Match`` / ``If-Modified-Since`` with 304 before the serializer
+runs.
+"""
+import hashlib
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+class ConditionalGetMixin:
+    """
+    Mixin for DRF views adding ETag / Last-Modified validators to ``get``.
+
+    Subclasses implement ``get_version`` and optionally
+    ``get_last_modified``; both receive the view's request and URL kwargs.
+    Returning None from either skips that validator.
+    """
+    cache_control = {}
+
+    def get_version(self, request, *args, **kwargs):
+        return None
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return None
+
+    def get_etag(self, request, *args, **kwargs):
+        version = self.get_version(request, *args, **kwargs)
+        if version is None:
+            return None
+        return hashlib.md5(repr(version).encode('utf-8')).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        view = condition(
+            etag_func=self.get_etag,
+            last_modified_func=self.get_last_modified
+        )(super().get)
+        response = view(request, *args, **kwargs)
+        # Not on errors, so a 404 isn't cached publicly. A 304 renews the
+        # client's cached 200 and keeps its caching headers.
+        if self.cache_control and response.status_code in (200, 304):
+            patch_cache_control(response, **self.cache_control)
+        return response
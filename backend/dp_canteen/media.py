@@ -0,0 +1,92 @@
+"""
+Media file serving for DP Canteen
+
+Serves uploads under MEDIA_URL with WhiteNoise's file responder, the same
+way WhiteNoiseMiddleware serves static files. Unlike static files, media
+appears at runtime, so files are looked up per request and their
+responders are kept in a small LRU keyed by the file's stat.
+Responses carry ETag / Last-Modified, answer conditional and Range
+requests, and use precompressed ``.br`` / ``.gz`` siblings when the
+client accepts them. Full-file responses are FileResponses, so WSGI
+servers with ``wsgi.file_wrapper`` (gunicorn) send them with sendfile().
+"""
+import os
+import re
+import stat
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import NotARegularFileError
+
+# Content-hashed names, e.g. image variants from canteen.images.variant_name
+IMMUTABLE_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+
+class MediaFilesMiddleware(WhiteNoise):
+    """Serve MEDIA_ROOT with long-lived caching for content-hashed files"""
+
+    serve = staticmethod(WhiteNoiseMiddleware.serve)
+
+    def __init__(self, get_response=None, maxsize=1024):
+        if not settings.SERVE_MEDIA:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        super().__init__(
+            application=None,
+            max_age=settings.MEDIA_MAX_AGE,
+            allow_all_origins=True,
+        )
+        self.root = os.path.abspath(settings.MEDIA_ROOT).rstrip(os.path.sep) + os.path.sep
+        self.prefix = urlparse(settings.MEDIA_URL).path
+        self.maxsize = maxsize
+        self._responders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        url = request.path_info
+        if url.startswith(self.prefix):
+            media_file = self.find_media_file(url)
+            if media_file is not None:
+                return self.serve(media_file, request)
+        return self.get_response(request)
+
+    def find_media_file(self, url):
+        """Responder for ``url``, or None to fall through to the URLconf"""
+        if not self.url_is_canonical(url):
+            return None
+        path = os.path.join(self.root, url[len(self.prefix):])
+        if not self.path_is_child_of(path, self.root) or self.is_compressed_variant(path):
+            return None
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+
+        version = (stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            cached = self._responders.get(url)
+            if cached is not None and cached[0] == version:
+                self._responders.move_to_end(url)
+                return cached[1]
+
+        try:
+            media_file = self.get_static_file(path, url)
+        except NotARegularFileError:
+            # Removed since the stat above
+            return None
+        with self._lock:
+            self._responders[url] = (version, media_file)
+            self._responders.move_to_end(url)
+            while len(self._responders) > self.maxsize:
+                self._responders.popitem(last=False)
+        return media_file
+
+    def immutable_file_test(self, path, url):
+        return bool(IMMUTABLE_NAME_RE.search(url))
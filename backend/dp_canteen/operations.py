@@ -0,0 +1,24 @@
+"""
+Migration operations shared by the apps
+"""
+from django.contrib.postgres import operations as postgres_operations
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    """
+    Build an index without blocking writes on PostgreSQL.
+
+    Uses ``CREATE INDEX CONCURRENTLY`` there and a plain ``AddIndex`` on
+    other databases. Migrations using it must set ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,141 @@
+"""
+Keyset pagination for order and payment lists
+
+PageNumberPagination runs a COUNT(*) for every page and skips rows with
+OFFSET, so page 500 reads and discards 10,000 rows first. These lists are
+instead paged on ``(created_at, id)``, newest first: the cursor holds the
+last row's key and the next page is ``WHERE (created_at, id) < cursor``,
+which an index on those columns answers directly at any depth. Rows
+inserted while a client pages are never shown twice or skipped.
+"""
+import base64
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on ``(created_at, id)`` without a total count.
+
+    Responses are ``{"next": url, "previous": url, "results": [...]}``.
+    Clients follow the links; the ``cursor`` values in them are opaque.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Page through several querysets as one list, e.g. live and archived
+        orders. No two of their rows may share a ``(created_at, pk)`` key.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        # One extra row tells whether there's another page that way
+        rows = []
+        for queryset in querysets:
+            rows.extend(self.get_page_queryset(queryset, position, reverse)[:self.page_size + 1])
+        if len(querysets) > 1:
+            rows.sort(key=lambda row: (row.created_at, row.pk), reverse=not reverse)
+            rows = rows[:self.page_size + 1]
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_page_queryset(self, queryset, position=None, reverse=False):
+        """``queryset`` ordered and filtered to the rows after ``position``"""
+        if position is None:
+            return queryset.order_by('-created_at', '-id')
+        created_at, pk = position
+        # The created_at range lets the index seek; the OR breaks ties
+        if reverse:
+            return queryset.filter(
+                Q(created_at__gte=created_at),
+                Q(created_at__gt=created_at) | Q(id__gt=pk)
+            ).order_by('created_at', 'id')
+        return queryset.filter(
+            Q(created_at__lte=created_at),
+            Q(created_at__lt=created_at) | Q(id__lt=pk)
+        ).order_by('-created_at', '-id')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        """``((created_at, id), reverse)`` from the request; (None, False) on the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            micros, pk, reverse = base64.urlsafe_b64decode(padded).decode('ascii').split(':')
+            created_at = EPOCH + int(micros) * MICROSECOND
+            return (created_at, int(pk)), reverse == '1'
+        except (TypeError, ValueError, OverflowError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        micros = (row.created_at - EPOCH) // MICROSECOND
+        raw = f'{micros}:{row.pk}:{int(reverse)}'
+        encoded = base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Paged past the end; go back to the first page
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -5,6 +5,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 import dj_database_url
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # Load environment from .env.local for local dev (Railway provides env vars directly)
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third party apps
     'rest_framework',
     'corsheaders',
@@ -56,6 +58,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'dp_canteen.media.MediaFilesMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -132,6 +135,11 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Serve MEDIA_ROOT from the app (see dp_canteen.media); disable when a CDN or
+# reverse proxy serves it
+SERVE_MEDIA = os.environ.get('SERVE_MEDIA', 'True').lower() == 'true'
+# Cache lifetime for media without a content hash in its name
+MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', 3600))
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -147,25 +155,102 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'dp_canteen.throttling.AnonSlidingWindowThrottle',
+        'dp_canteen.throttling.UserSlidingWindowThrottle',
+        'dp_canteen.throttling.ScopedSlidingWindowThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        # Per-endpoint scopes (see throttle_scope on the views)
+        'menu': os.environ.get('THROTTLE_RATE_MENU', '120/min'),
+        'autocomplete': os.environ.get('THROTTLE_RATE_AUTOCOMPLETE', '600/min'),
+        'order_create': os.environ.get('THROTTLE_RATE_ORDER_CREATE', '10/min'),
+        'payment_confirm': os.environ.get('THROTTLE_RATE_PAYMENT_CONFIRM', '10/min'),
+        'qr_verify': os.environ.get('THROTTLE_RATE_QR_VERIFY', '60/min'),
+        # Stream opens, including reconnects (every few seconds under WSGI)
+        'order_events': os.environ.get('THROTTLE_RATE_ORDER_EVENTS', '30/min'),
     }
 }
 
+# Cache - Redis is shared by all workers so throttle limits hold across them;
+# without REDIS_URL each process falls back to its own in-memory cache
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'dp-canteen',
+        }
+    }
+
+# Seconds a cached menu snapshot may be served. Invalidation reaches every
+# worker through the shared cache; with per-process LocMem this bounds staleness.
+MENU_SNAPSHOT_TIMEOUT = None if os.environ.get('REDIS_URL') else 60
+
+# Menu versions kept in the change log; older ?since= values force a full refetch
+MENU_CHANGE_RETENTION = int(os.environ.get('MENU_CHANGE_RETENTION', 1000))
+
+# Seconds clients and reverse proxies may cache public canteen/menu responses
+MENU_CACHE_MAX_AGE = int(os.environ.get('MENU_CACHE_MAX_AGE', 30))
+
+# Threads per process building resized image variants (0 builds them inline)
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', 2))
+
+# Delivers order status events to streams on every worker; the local backend
+# only reaches streams served by the same process
+REDIS_URL = os.environ.get('REDIS_URL', '')
+ORDER_EVENTS_BACKEND = os.environ.get(
+    'ORDER_EVENTS_BACKEND',
+    'orders.events.RedisBackend' if REDIS_URL else 'orders.events.LocalBackend'
+)
+
+# Seconds an order event stream stays open before the client reconnects
+ORDER_EVENTS_MAX_AGE = int(os.environ.get('ORDER_EVENTS_MAX_AGE', 300))
+
+# Seconds a stored Idempotency-Key response is replayed to retries
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+# Seconds the per-day pickup slot loads shown to clients may be cached
+PICKUP_SLOT_CACHE_TTL = int(os.environ.get('PICKUP_SLOT_CACHE_TTL', 10))
+
+# Days after which completed and cancelled orders may be moved to the archive
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 90))
+
 # CORS configuration
 CORS_ALLOWED_ORIGINS = os.environ.get(
     'CORS_ALLOWED_ORIGINS', 
     'http://localhost:3000,http://127.0.0.1:3000'
 ).split(',')
 CORS_ALLOW_ALL_ORIGINS = DEBUG
+CORS_ALLOW_HEADERS = [*default_headers, 'idempotency-key', 'last-event-id']
+CORS_EXPOSE_HEADERS = ['idempotent-replayed']
 
 # Firebase configuration
 FIREBASE_CONFIG_PATH = os.environ.get('FIREBASE_CONFIG_PATH', BASE_DIR / 'firebase-adminsdk.json')
 
+# Verify Firebase ID tokens locally against a preloaded signing-key store
+FIREBASE_LOCAL_VERIFICATION = os.environ.get('FIREBASE_LOCAL_VERIFICATION', 'True').lower() == 'true'
+FIREBASE_PROJECT_ID = os.environ.get('FIREBASE_PROJECT_ID', os.environ.get('GOOGLE_CLOUD_PROJECT', ''))
+# Signing certificate source: a local JSON file or an HTTP endpoint
+FIREBASE_CERTS_FILE = os.environ.get('FIREBASE_CERTS_FILE', '')
+FIREBASE_CERTS_URL = os.environ.get(
+    'FIREBASE_CERTS_URL',
+    'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+)
+
+# Seconds to coalesce Firebase profile changes before writing them (0 writes immediately)
+PROFILE_SYNC_INTERVAL = float(os.environ.get('PROFILE_SYNC_INTERVAL', 5))
+
+# Number of verified Firebase ID tokens cached per worker (0 disables the cache)
+FIREBASE_TOKEN_CACHE_SIZE = int(os.environ.get('FIREBASE_TOKEN_CACHE_SIZE', 1024))
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -0,0 +1,169 @@
+"""
+Sliding-window rate limiting for DP Canteen
+
+DRF's SimpleRateThrottle keeps a list of timestamps per client in the
+default cache and rewrites it on every request. These throttles keep two
+integer counters per client instead (the current and previous fixed
+windows) and estimate the sliding-window count from them, so each check is
+one ``get_many`` and one ``incr`` against a shared store such as Redis.
+"""
+import logging
+
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+# Used when the shared store is unreachable, so a cache outage degrades to
+# per-process limits instead of failing requests
+local_cache = LocMemCache('throttle-fallback', {'OPTIONS': {'MAX_ENTRIES': 10000}})
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Base throttle using fixed-size sliding-window counters.
+
+    The request count over the last ``duration`` seconds is estimated as
+    ``previous * (1 - elapsed / duration) + current``.
+    """
+    cache = default_cache
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.elapsed = self.now - window * self.duration
+        current_key = f'{self.key}:{window}'
+        previous_key = f'{self.key}:{window - 1}'
+
+        counts = self._get_counts([previous_key, current_key])
+        self.previous = counts.get(previous_key, 0)
+        self.current = counts.get(current_key, 0)
+
+        if self.estimate(self.previous, self.current, self.elapsed) >= self.num_requests:
+            return self.throttle_failure()
+
+        self.current = self._increment(current_key)
+        return self.throttle_success()
+
+    def estimate(self, previous, current, elapsed):
+        """Weighted request count over the sliding window"""
+        return previous * (1 - elapsed / self.duration) + current
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """Seconds until the sliding-window estimate drops below the limit"""
+        remaining = self.duration - self.elapsed
+        excess = self.estimate(self.previous, self.current, self.elapsed) - self.num_requests
+
+        # The previous window's weight decays away during the current window
+        if self.previous and excess < self.previous * remaining / self.duration:
+            return max(excess * self.duration / self.previous, 1)
+
+        # Otherwise the current count becomes the previous window's count
+        if self.current >= self.num_requests:
+            remaining += self.duration * (1 - self.num_requests / self.current)
+        return max(remaining, 1)
+
+    def _get_counts(self, keys):
+        try:
+            return self.cache.get_many(keys)
+        except Exception as e:
+            logger.warning('Throttle store unavailable, using local counters: %s', e)
+            return local_cache.get_many(keys)
+
+    def _increment(self, key):
+        for store in (self.cache, local_cache):
+            try:
+                store.add(key, 0, 2 * self.duration)
+                return store.incr(key)
+            except ValueError:
+                # Evicted between add() and incr()
+                store.set(key, 1, 2 * self.duration)
+                return 1
+            except Exception as e:
+                logger.warning('Throttle store unavailable, using local counters: %s', e)
+        return 1
+
+
+class AnonSlidingWindowThrottle(SlidingWindowThrottle):
+    """Limits anonymous clients by IP address"""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
+
+
+class UserSlidingWindowThrottle(SlidingWindowThrottle):
+    """Limits authenticated users by id and anonymous clients by IP"""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': ident
+        }
+
+
+class ScopedSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Per-endpoint limits for views that set a ``throttle_scope`` attribute.
+
+    Views without a scope are not limited by this throttle.
+    """
+    scope_attr = 'throttle_scope'
+
+    def __init__(self):
+        # Rate is resolved per view in allow_request
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': ident
+        }
+
+
+def throttle_scope(scope):
+    """
+    Set ``throttle_scope`` on a function-based view.
+
+    Must be applied above ``@api_view`` because it annotates the generated
+    view class.
+    """
+    def decorator(view):
+        view.cls.throttle_scope = scope
+        return view
+    return decorator
@@ -14,5 +14,6 @@ urlpatterns = [
     path('api/payments/', include('payments.urls')),
 ]
 
-if settings.DEBUG:
+# MediaFilesMiddleware serves media unless SERVE_MEDIA is off
+if settings.DEBUG and not settings.SERVE_MEDIA:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
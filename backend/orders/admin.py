@@ -1,9 +1,10 @@
 """
 Admin configuration for orders app
 """
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
-from .models import Order, OrderItem
+from .models import ArchivedOrder, Order, OrderItem
+from .views import cancel
 
 
 class OrderItemInline(admin.TabularInline):
@@ -42,6 +43,34 @@ class OrderAdmin(admin.ModelAdmin):
         ('Timestamps', {'fields': ('created_at', 'updated_at', 'paid_at', 'confirmed_at', 'completed_at')}),
     )
     
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Only the edited columns; a full save would write the status the
+        # form was loaded with over any change the API made since
+        fields = [name for name in form.changed_data if name != 'status']
+        if fields:
+            obj.save(update_fields=[*fields, 'updated_at'])
+        if 'status' not in form.changed_data:
+            return
+        
+        # Status changes go through the same paths as in the API, so they are
+        # checked, reach the sales rollups and event streams, and a cancel
+        # returns the order's stock and pickup slot time
+        status = obj.status
+        obj.status = form.initial['status']
+        if status == Order.Status.CANCELLED:
+            changed = cancel(obj)
+        else:
+            changed = obj.transition_to(status)
+        if not changed:
+            current = Order.objects.filter(pk=obj.pk).values_list('status', flat=True).get()
+            self.message_user(
+                request,
+                f'Status not changed: an order can\'t move from {current} to {status}',
+                messages.ERROR
+            )
+    
     def total_display(self, obj):
         return f'₹{obj.total_amount}'
     total_display.short_description = 'Total'
@@ -82,3 +111,19 @@ class OrderItemAdmin(admin.ModelAdmin):
     def total_display(self, obj):
         return f'₹{obj.total_price}'
     total_display.short_description = 'Total'
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Read-only admin for archived orders"""
+    
+    list_display = ['order_id', 'user', 'canteen', 'status', 'total_amount', 'created_at', 'archived_at']
+    list_filter = ['status', 'canteen']
+    search_fields = ['order_id', 'user__email']
+    date_hierarchy = 'created_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -8,3 +8,6 @@ class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
     verbose_name = 'Order Management'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,103 @@
+"""
+Archival of closed orders
+
+Completed and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS are
+moved, with their items, payment and QR code, into ``ArchivedOrder`` rows
+and deleted from the hot tables, so the tables the live order flow and
+manager queue hit stay small. Each archived row keeps the order's
+primary key and ``created_at``, which lets the order history page through
+live and archived orders as one list (see ``OrderListView``).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from payments.models import Payment, QRCode
+from payments.serializers import PaymentSerializer
+from .models import ArchivedOrder, Order
+from .serializers import OrderListSerializer, OrderSerializer
+
+ARCHIVED_STATUSES = [Order.Status.COMPLETED, Order.Status.CANCELLED]
+
+
+def archive_cutoff(days=None):
+    """Orders created before this are old enough to archive"""
+    if days is None:
+        days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(status__in=ARCHIVED_STATUSES, created_at__lt=cutoff)
+
+
+def row_values(instance):
+    """A model instance's column values, as stored in the archive"""
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def related_or_none(order, name):
+    try:
+        return getattr(order, name)
+    except (Payment.DoesNotExist, QRCode.DoesNotExist):
+        return None
+
+
+def archived_order(order):
+    """Unsaved ArchivedOrder holding ``order`` and its related rows"""
+    items = list(order.items.all())
+    payment = related_or_none(order, 'payment')
+    qr_code = related_or_none(order, 'qr_code')
+    order.items_count = len(items)
+    return ArchivedOrder(
+        id=order.pk,
+        order_id=order.order_id,
+        user_id=order.user_id,
+        canteen_id=order.canteen_id,
+        status=order.status,
+        total_amount=order.total_amount,
+        created_at=order.created_at,
+        # API representations, served as they were at archival
+        summary=OrderListSerializer(order).data,
+        data={
+            'order': OrderSerializer(order).data,
+            'payment': PaymentSerializer(payment).data if payment else None,
+            # Raw rows, enough to restore the order if ever needed
+            'rows': {
+                'order': row_values(order),
+                'items': [row_values(item) for item in items],
+                'payment': row_values(payment) if payment else None,
+                'qr_code': row_values(qr_code) if qr_code else None,
+            },
+        }
+    )
+
+
+def archive_batch(cutoff, batch_size):
+    """Archive up to ``batch_size`` of the oldest archivable orders; returns how many"""
+    with transaction.atomic():
+        # Rows another archiver has locked are left for its batch
+        pks = list(
+            archivable_orders(cutoff).order_by('created_at', 'id').select_for_update(
+                skip_locked=True
+            ).values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return 0
+        orders = Order.objects.filter(pk__in=pks).select_related(
+            'user', 'canteen', 'pickup_slot', 'payment', 'qr_code'
+        ).prefetch_related('items')
+        ArchivedOrder.objects.bulk_create([archived_order(order) for order in orders])
+        # Cascades to the items, payment and QR code
+        Order.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def archive_orders(cutoff, batch_size=500):
+    """Archive every archivable order in batches; yields each batch's size"""
+    while True:
+        archived = archive_batch(cutoff, batch_size)
+        if not archived:
+            return
+        yield archived
@@ -0,0 +1,196 @@
+"""
+Order status events for streaming clients
+
+Status changes are published to a ``user:<id>`` and a ``canteen:<id>``
+channel once their transaction commits. Each process keeps its own
+subscribers (the open event streams) and receives events from every worker
+through the ORDER_EVENTS_BACKEND: LocalBackend delivers within the process
+only, RedisBackend fans events out through Redis pub/sub.
+
+An event is a snapshot of an order's status, so delivering it twice is
+harmless. Event ids are ``<updated_at in microseconds>-<order pk>``, which
+lets a reconnecting stream replay what it missed from the orders table
+instead of a server-side buffer (see ``orders.streams``).
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def event_id(order):
+    micros = int(order.updated_at.timestamp() * 1_000_000)
+    return f'{micros}-{order.pk}'
+
+
+def parse_event_id(value):
+    """``(updated_at, pk)`` from an event id, or None if it isn't one"""
+    try:
+        micros, pk = value.split('-')
+        return datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc), int(pk)
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def order_event(order):
+    """Event payload for an order's current status"""
+    return {
+        'id': event_id(order),
+        'order_id': order.order_id,
+        'canteen_id': order.canteen_id,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'qr_code_used': order.qr_code_used,
+        'total_amount': str(order.total_amount),
+        'updated_at': order.updated_at.isoformat(),
+    }
+
+
+def publish_order(order):
+    """Publish ``order``'s current status once the transaction commits"""
+    event = order_event(order)
+    channels = [f'user:{order.user_id}', f'canteen:{order.canteen_id}']
+    transaction.on_commit(lambda: broker.publish(channels, event))
+
+
+class LocalBackend:
+    """Delivers events to this process only (single worker, tests)"""
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, channels, event):
+        self.deliver(channels, event)
+
+
+class RedisBackend:
+    """
+    Fans events out to every worker through one Redis pub/sub channel.
+
+    Each worker listens on a daemon thread and hands messages to its own
+    subscribers. Events published while a listener is reconnecting are
+    lost to it; clients recover them by resuming from their last event id.
+    """
+    channel = 'dp-canteen:order-events'
+
+    def __init__(self, deliver):
+        import redis
+
+        self.deliver = deliver
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+        self._thread = threading.Thread(target=self._listen, name='order-events', daemon=True)
+        self._thread.start()
+
+    def publish(self, channels, event):
+        self.client.publish(self.channel, json.dumps({'channels': channels, 'event': event}))
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    data = json.loads(message['data'])
+                    self.deliver(data['channels'], data['event'])
+            except Exception as e:
+                logger.warning('Order event listener lost Redis, reconnecting: %s', e)
+                time.sleep(1)
+
+
+class Subscription:
+    """Queue of events for one stream, fed from any thread"""
+
+    def __init__(self, broker, channels, maxsize=100):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        # Set when events were dropped; the stream should end so the client
+        # resumes from its last event id
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Next event; raises asyncio.TimeoutError after ``timeout`` seconds"""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """In-process pub/sub of order events over a cross-worker backend"""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self._backend = None
+
+    @property
+    def backend(self):
+        with self._lock:
+            if self._backend is None:
+                self._backend = import_string(settings.ORDER_EVENTS_BACKEND)(self.deliver)
+            return self._backend
+
+    def publish(self, channels, event):
+        # Called after commit, so a backend outage mustn't fail the request
+        try:
+            self.backend.publish(channels, event)
+        except Exception as e:
+            logger.warning('Could not publish order event: %s', e)
+
+    def deliver(self, channels, event):
+        """Hand an event from any worker to this process's subscribers"""
+        with self._lock:
+            subscriptions = set()
+            for channel in channels:
+                subscriptions.update(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def subscribe(self, channels):
+        """Subscribe the running event loop to ``channels``"""
+        # Starts the backend's listener before the first event can arrive
+        self.backend
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscriptions.values())
+
+
+broker = Broker()
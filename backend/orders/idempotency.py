@@ -0,0 +1,121 @@
+"""
+Idempotency-Key support for order and payment endpoints
+
+Clients retrying a POST send the same ``Idempotency-Key`` header. The first
+request inserts an IdempotencyKey row for ``(user, key)`` and stores its
+response in the same transaction as the work it did, so a retry replays
+that response instead of running the view again. A duplicate that arrives
+while the first request is still running blocks on the row's unique index
+until that transaction ends, then replays the stored response (or runs
+itself if the first request rolled back).
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """Hash of what the request asks for, to catch keys reused for something else"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    payload = f'{request.method} {request.path}\n{body}'
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def claim_key(user, key, fingerprint):
+    """
+    Insert the key's row, or return the committed row of an earlier request.
+
+    Returns ``(record, created)``. Must run inside a transaction.
+    """
+    now = timezone.now()
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+                )
+            return record, True
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            # Expired and cleared by another request since the insert
+            continue
+        if record.expires_at > now:
+            return record, False
+        IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=now).delete()
+
+
+def replay(record):
+    response = Response(record.response_data, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def handle_idempotent(request, view):
+    """Run ``view()`` at most once per Idempotency-Key and return its response"""
+    key = request.headers.get(HEADER)
+    if not key or not request.user.is_authenticated:
+        return view()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fingerprint = request_fingerprint(request)
+    with transaction.atomic():
+        record, created = claim_key(request.user, key, fingerprint)
+        if not created:
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {'error': f'{HEADER} was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            return replay(record)
+
+        # Exceptions roll the key back with everything else, so a retry runs again
+        response = view()
+        if response.status_code >= 500 or not isinstance(response, Response):
+            record.delete()
+            return response
+
+        record.status_code = response.status_code
+        record.response_data = response.data
+        record.save(update_fields=['status_code', 'response_data'])
+        return response
+
+
+def idempotent(view_func):
+    """
+    Honour Idempotency-Key on a function-based view.
+
+    Goes below ``@api_view`` so the request is already authenticated.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        return handle_idempotent(request, lambda: view_func(request, *args, **kwargs))
+    return wrapper
+
+
+class IdempotentMixin:
+    """Mixin for DRF views honouring Idempotency-Key on ``post``"""
+
+    def post(self, request, *args, **kwargs):
+        post = super().post
+        return handle_idempotent(request, lambda: post(request, *args, **kwargs))
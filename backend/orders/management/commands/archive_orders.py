@@ -0,0 +1,40 @@
+"""
+Management command to move old completed and cancelled orders into the archive
+"""
+from django.core.management.base import BaseCommand, CommandError
+from orders.archive import archivable_orders, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Move completed and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS, with '
+        'their items, payment and QR code, into the order archive. Each batch is one transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            metavar='DAYS',
+            help='Archive orders placed more than DAYS days ago (default ORDER_ARCHIVE_AFTER_DAYS)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders to archive')
+
+    def handle(self, *args, **options):
+        days, batch_size = options['older_than'], options['batch_size']
+        if (days is not None and days < 0) or batch_size < 1:
+            raise CommandError('--older-than must not be negative and --batch-size must be at least 1')
+        cutoff = archive_cutoff(days)
+
+        if options['dry_run']:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(f'{count} orders placed before {cutoff:%Y-%m-%d %H:%M} would be archived')
+            return
+
+        total = 0
+        for archived in archive_orders(cutoff, batch_size):
+            total += archived
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  archived {archived} orders ({total} so far)')
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} orders placed before {cutoff:%Y-%m-%d %H:%M}'))
@@ -0,0 +1,99 @@
+"""
+Management command to compare the old random-suffix order IDs with time-sortable ones
+"""
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from orders.ids import new_id
+
+TABLE = 'benchmark_order_ids'
+INDEX = 'benchmark_order_ids_uniq'
+
+CREATE_TABLE = {
+    'postgresql': f'CREATE TABLE {TABLE} (id bigserial PRIMARY KEY, order_id varchar(50) NOT NULL)',
+    'sqlite': f'CREATE TABLE {TABLE} (id integer PRIMARY KEY AUTOINCREMENT, order_id varchar(50) NOT NULL)',
+}
+INDEX_SIZE = {
+    'postgresql': f"SELECT pg_relation_size('{INDEX}')",
+    # Needs SQLite built with the dbstat table, as Python's usually is
+    'sqlite': f"SELECT SUM(pgsize) FROM dbstat WHERE name = '{INDEX}'",
+}
+
+
+def legacy_order_id():
+    """Order IDs as they were generated before orders.ids"""
+    timestamp = timezone.now().strftime('%Y%m%d%H%M')
+    unique = uuid.uuid4().hex[:6].upper()
+    return f'DP{timestamp}{unique}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Insert order IDs from the old and the time-sortable generator into a scratch '
+        'table with a unique index and report duplicates, insert rate and index size. '
+        'The table is dropped afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200000, help='IDs per scheme')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per transaction')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in CREATE_TABLE:
+            raise CommandError(f'The benchmark runs on PostgreSQL or SQLite, not {vendor}')
+        count, batch_size = options['count'], options['batch_size']
+        if count < 1 or batch_size < 1:
+            raise CommandError('--count and --batch-size must be at least 1')
+
+        schemes = [
+            ('random suffix', legacy_order_id),
+            ('time-sortable', lambda: new_id('DP')),
+        ]
+        self.stdout.write(f'{count} IDs per scheme, {batch_size} rows per transaction')
+        for label, generate in schemes:
+            self.report(label, generate, vendor, count, batch_size)
+
+    def report(self, label, generate, vendor, count, batch_size):
+        started = time.perf_counter()
+        ids = [generate() for _ in range(count)]
+        generated = time.perf_counter() - started
+        # Each duplicate would have been an IntegrityError on insert
+        unique_ids = list(dict.fromkeys(ids))
+        duplicates = count - len(unique_ids)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+            cursor.execute(CREATE_TABLE[vendor])
+            cursor.execute(f'CREATE UNIQUE INDEX {INDEX} ON {TABLE} (order_id)')
+        try:
+            started = time.perf_counter()
+            for start in range(0, len(unique_ids), batch_size):
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.executemany(
+                        f'INSERT INTO {TABLE} (order_id) VALUES (%s)',
+                        [(order_id,) for order_id in unique_ids[start:start + batch_size]]
+                    )
+            inserted = time.perf_counter() - started
+            index_size = self.index_size(vendor)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {TABLE}')
+
+        size = f'{index_size / 1024:,.0f} KiB' if index_size is not None else 'n/a'
+        self.stdout.write(
+            f'  {label:<14} e.g. {ids[-1]:<20} duplicates: {duplicates:<6} '
+            f'generate: {count / generated:>9,.0f}/s   insert: {len(unique_ids) / inserted:>8,.0f} rows/s   '
+            f'index: {size}'
+        )
+
+    def index_size(self, vendor):
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(INDEX_SIZE[vendor])
+                return cursor.fetchone()[0]
+        except DatabaseError:
+            return None
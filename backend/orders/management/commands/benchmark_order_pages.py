@@ -0,0 +1,142 @@
+"""
+Management command to compare deep-page latency of page-number and keyset pagination
+"""
+import statistics
+import time
+import uuid
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIRequestFactory, force_authenticate
+from accounts.models import User
+from canteen.models import Canteen
+from dp_canteen.pagination import KeysetPagination
+from orders.models import Order
+from orders.views import ManagerOrderListView, OrderListView
+from payments.models import Payment
+from payments.views import PaymentListView
+
+
+class PageNumberBaseline(PageNumberPagination):
+    """The previous default pagination, with a settable page size"""
+    page_size_query_param = 'page_size'
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the first and a deep page of the order and payment lists with '
+        'page-number and keyset pagination. Seeds its own rows and rolls them back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=500, help='Deep page to time')
+        parser.add_argument('--page-size', type=int, default=20, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per page (median shown)')
+
+    def handle(self, *args, **options):
+        page, page_size, repeat = options['page'], options['page_size'], options['repeat']
+        if page < 2 or page_size < 1 or repeat < 1:
+            raise CommandError('--page must be at least 2, --page-size and --repeat at least 1')
+        rows = page * page_size
+
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h and h != '*'), 'localhost')
+        self.factory = APIRequestFactory(HTTP_HOST=host)
+        self.page_size = page_size
+        self.repeat = repeat
+
+        with transaction.atomic():
+            self.stdout.write(f'Seeding {rows} orders and payments...')
+            user, manager = self.seed(rows)
+            lists = [
+                ('Customer orders', OrderListView, user, '/api/orders/'),
+                ('Manager orders', ManagerOrderListView, manager, '/api/orders/manager/list/'),
+                ('Payments', PaymentListView, user, '/api/payments/'),
+            ]
+            for label, view_class, list_user, path in lists:
+                self.stdout.write(f'\n{label} ({rows} rows, {page_size} per page)')
+                self.report('page-number', PageNumberBaseline, view_class, list_user, path, page)
+                self.report('keyset', KeysetPagination, view_class, list_user, path, page)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('\nDone; seeded rows rolled back'))
+
+    def seed(self, rows):
+        tag = uuid.uuid4().hex[:8]
+        canteen = Canteen.objects.create(name=f'Pagination benchmark {tag}')
+        user = User.objects.create(email=f'bench-{tag}@example.com', firebase_uid=f'bench-{tag}')
+        manager = User.objects.create(
+            email=f'bench-manager-{tag}@example.com',
+            firebase_uid=f'bench-manager-{tag}',
+            role=User.Role.MANAGER,
+            managed_canteen=canteen
+        )
+        orders = Order.objects.bulk_create([
+            Order(
+                order_id=f'BENCH{tag}{n:08d}',
+                user=user,
+                canteen=canteen,
+                status=Order.Status.PAID,
+                subtotal=100,
+                total_amount=100
+            )
+            for n in range(rows)
+        ], batch_size=500)
+        Payment.objects.bulk_create([
+            Payment(
+                payment_id=f'BENCH{tag}{order.pk:08d}',
+                order=order,
+                user=user,
+                amount=100,
+                status=Payment.Status.SUCCESS
+            )
+            for order in orders
+        ], batch_size=500)
+        return user, manager
+
+    def get(self, view, user, path, params):
+        request = self.factory.get(path, {'page_size': self.page_size, **params})
+        force_authenticate(request, user=user)
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = view(request)
+            response.render()
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f'{path} returned {response.status_code}: {response.data}')
+        return response, elapsed, len(queries)
+
+    def timed(self, view, user, path, params):
+        runs = [self.get(view, user, path, params) for _ in range(self.repeat)]
+        return statistics.median(elapsed for _, elapsed, _ in runs) * 1000, runs[0][2]
+
+    def report(self, label, pagination_class, view_class, user, path, page):
+        view = view_class.as_view(
+            pagination_class=pagination_class,
+            throttle_classes=[]
+        )
+        first, first_queries = self.timed(view, user, path, {})
+
+        if pagination_class is KeysetPagination:
+            # Cursors can only be reached by walking the pages before them
+            params = {}
+            for _ in range(page - 1):
+                response, _, _ = self.get(view, user, path, params)
+                cursor = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+                params = {'cursor': cursor}
+        else:
+            params = {'page': page}
+        deep, deep_queries = self.timed(view, user, path, params)
+
+        self.stdout.write(
+            f'  {label:<12} page 1: {first:7.2f} ms ({first_queries} queries)   '
+            f'page {page}: {deep:7.2f} ms ({deep_queries} queries)'
+        )
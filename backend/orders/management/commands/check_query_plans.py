@@ -0,0 +1,214 @@
+"""
+Management command to check the hot list queries use their indexes
+"""
+import random
+import re
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from accounts.models import User
+from canteen.models import Canteen, MenuItem
+from canteen.views import MenuItemListView
+from dp_canteen.pagination import KeysetPagination
+from orders.models import ArchivedOrder, Order
+from orders.views import ManagerOrderListView, OrderListView
+from payments.models import Payment
+from payments.views import PaymentListView
+
+# Full table scans of the checked table, per database
+SEQUENTIAL_SCAN = {
+    'postgresql': r'Seq Scan on {table}\b',
+    'sqlite': r'\bSCAN {table}\b(?! USING)',
+}
+INDEX_USED = {
+    'postgresql': r'(?:Index (?:Only )?Scan using|Bitmap Index Scan on) (\w+)',
+    'sqlite': r'USING (?:COVERING )?INDEX (\w+)',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the order, payment and menu list queries against seeded data and '
+        'fail if any falls back to a sequential scan. Seeded rows are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=20000, help='Orders (and payments) to seed')
+        parser.add_argument('--menu-items', type=int, default=2000, help='Menu items to seed')
+        parser.add_argument(
+            '--existing',
+            action='store_true',
+            help="Don't seed; explain against the rows already in the database"
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SEQUENTIAL_SCAN:
+            raise CommandError(f'Query plans can only be checked on PostgreSQL or SQLite, not {vendor}')
+        self.factory = APIRequestFactory()
+        self.verbosity = options['verbosity']
+
+        with transaction.atomic():
+            if options['existing']:
+                fixtures = self.existing_fixtures()
+            else:
+                self.stdout.write(
+                    f'Seeding {options["orders"]} orders and {options["menu_items"]} menu items...'
+                )
+                fixtures = self.seed(options['orders'], options['menu_items'])
+            with connection.cursor() as cursor:
+                for model in (Order, ArchivedOrder, Payment, MenuItem):
+                    cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+            failures = 0
+            for label, model, queryset in self.hot_queries(*fixtures):
+                failures += not self.check_plan(vendor, label, model._meta.db_table, queryset)
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'{failures} queries fall back to a sequential scan')
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index'))
+
+    def seed(self, orders, menu_items):
+        tag = uuid.uuid4().hex[:8]
+        canteens = Canteen.objects.bulk_create([
+            Canteen(name=f'Plan check {tag} {n}') for n in range(5)
+        ])
+        users = User.objects.bulk_create([
+            User(email=f'plan-{tag}-{n}@example.com', firebase_uid=f'plan-{tag}-{n}')
+            for n in range(50)
+        ])
+        manager = User.objects.create(
+            email=f'plan-manager-{tag}@example.com',
+            firebase_uid=f'plan-manager-{tag}',
+            role=User.Role.MANAGER,
+            managed_canteen=canteens[0]
+        )
+
+        rng = random.Random(0)
+        statuses = Order.Status.values
+        created = Order.objects.bulk_create([
+            Order(
+                order_id=f'PLAN{tag}{n:08d}',
+                user=rng.choice(users),
+                canteen=rng.choice(canteens),
+                status=rng.choice(statuses),
+                total_amount=Decimal('50.00')
+            )
+            for n in range(orders)
+        ], batch_size=500)
+        Payment.objects.bulk_create([
+            Payment(
+                payment_id=f'PLAN{tag}{order.pk:08d}',
+                order=order,
+                user_id=order.user_id,
+                amount=order.total_amount
+            )
+            for order in created
+        ], batch_size=500)
+
+        # Spread orders over a year so date filters are selective
+        now = timezone.now()
+        pks = [order.pk for order in created]
+        for day in range(365):
+            day_pks = pks[day::365]
+            if day_pks:
+                created_at = now - timedelta(days=day)
+                Order.objects.filter(pk__in=day_pks).update(created_at=created_at)
+                Payment.objects.filter(order_id__in=day_pks).update(created_at=created_at)
+
+        MenuItem.objects.bulk_create([
+            MenuItem(
+                canteen=rng.choice(canteens),
+                name=f'Plan item {tag} {n}',
+                price=Decimal('40.00'),
+                is_available=rng.random() < 0.8,
+                display_order=rng.randrange(50)
+            )
+            for n in range(menu_items)
+        ], batch_size=500)
+        return users[0], manager, canteens[0]
+
+    def existing_fixtures(self):
+        order = Order.objects.select_related('user', 'canteen').first()
+        manager = User.objects.filter(
+            role=User.Role.MANAGER,
+            managed_canteen__isnull=False
+        ).select_related('managed_canteen').first()
+        if order is None or manager is None:
+            raise CommandError('--existing needs at least one order and one manager with a canteen')
+        return order.user, manager, manager.managed_canteen
+
+    def view(self, view_class, user, params=None, **kwargs):
+        request = Request(self.factory.get('/', params or {}))
+        request.user = user
+        return view_class(request=request, args=(), kwargs=kwargs, format_kwarg=None)
+
+    def view_queryset(self, view_class, user, params=None, **kwargs):
+        """The queryset a list view builds for ``user`` and query ``params``"""
+        view = self.view(view_class, user, params, **kwargs)
+        return view.filter_queryset(view.get_queryset())
+
+    def hot_queries(self, user, manager, canteen):
+        """``(label, model, queryset)`` for each query that must use an index"""
+        paginator = KeysetPagination()
+        page_size = paginator.page_size + 1
+
+        def first_page(queryset):
+            return paginator.get_page_queryset(queryset)[:page_size]
+
+        def deep_page(queryset):
+            # Cursor in the middle of the rows, as after paging for a while
+            rows = paginator.get_page_queryset(queryset)
+            middle = rows[rows.count() // 2]
+            return paginator.get_page_queryset(queryset, (middle.created_at, middle.pk))[:page_size]
+
+        customer_orders = self.view_queryset(OrderListView, user)
+        manager_orders = self.view_queryset(ManagerOrderListView, manager)
+        day = timezone.localdate() - timedelta(days=30)
+        return [
+            ('Customer orders', Order, first_page(customer_orders)),
+            ('Customer orders, deep page', Order, deep_page(customer_orders)),
+            (
+                'Customer orders by status', Order,
+                first_page(self.view_queryset(OrderListView, user, {'status': 'paid'}))
+            ),
+            (
+                'Archived customer orders', ArchivedOrder,
+                first_page(self.view(OrderListView, user).get_archived_queryset())
+            ),
+            ('Canteen orders', Order, first_page(manager_orders)),
+            ('Canteen orders, deep page', Order, deep_page(manager_orders)),
+            (
+                'Canteen orders by status and date', Order,
+                first_page(self.view_queryset(
+                    ManagerOrderListView, manager, {'status': 'paid', 'date': day.isoformat()}
+                ))
+            ),
+            ('Payments', Payment, first_page(self.view_queryset(PaymentListView, user))),
+            (
+                'Menu items', MenuItem,
+                self.view_queryset(MenuItemListView, user, canteen_id=canteen.pk)[:page_size]
+            ),
+        ]
+
+    def check_plan(self, vendor, label, table, queryset):
+        plan = queryset.explain()
+        if re.search(SEQUENTIAL_SCAN[vendor].format(table=table), plan):
+            self.stdout.write(self.style.ERROR(f'  FAIL {label}: sequential scan on {table}'))
+            self.stdout.write(self.indent(plan))
+            return False
+        indexes = ', '.join(dict.fromkeys(re.findall(INDEX_USED[vendor], plan))) or 'no index'
+        self.stdout.write(f'  ok   {label} ({indexes})')
+        if self.verbosity >= 2:
+            self.stdout.write(self.indent(plan))
+        return True
+
+    def indent(self, plan):
+        return '\n'.join(f'         {line}' for line in plan.splitlines())
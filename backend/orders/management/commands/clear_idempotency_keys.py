@@ -0,0 +1,14 @@
+"""
+Management command to delete expired Idempotency-Key records
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses past IDEMPOTENCY_KEY_TTL'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
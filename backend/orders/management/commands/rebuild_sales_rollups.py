@@ -0,0 +1,29 @@
+"""
+Management command to rebuild the sales rollups from order history
+"""
+from django.core.management.base import BaseCommand, CommandError
+from canteen.models import Canteen
+from orders.rollups import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily and hourly canteen sales and daily menu item sales '
+        'from all paid orders, live and archived, replacing the current rollups.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--canteen', type=int, help='Only rebuild this canteen')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per insert')
+
+    def handle(self, *args, **options):
+        canteen_id = options['canteen']
+        if canteen_id is not None and not Canteen.objects.filter(pk=canteen_id).exists():
+            raise CommandError(f'Canteen {canteen_id} does not exist')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        daily, hourly, items = rebuild_sales_rollups(canteen_id, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {daily} daily, {hourly} hourly and {items} menu item sales rows'
+        ))
@@ -0,0 +1,99 @@
+"""
+Management command to check stock reservation under concurrent orders
+"""
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+from accounts.models import User
+from canteen.models import Canteen, MenuItem
+from orders.models import OrderItem
+from orders.views import OrderCreateView
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire simultaneous orders at the last units of a stock-tracked item and '
+        'verify none are oversold. Creates and removes its own canteen and users.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200, help='Concurrent orders')
+        parser.add_argument('--stock', type=int, default=25, help='Units in stock')
+        parser.add_argument('--quantity', type=int, default=1, help='Units per order')
+
+    def handle(self, *args, **options):
+        orders, stock, quantity = options['orders'], options['stock'], options['quantity']
+        tag = uuid.uuid4().hex[:8]
+
+        canteen = Canteen.objects.create(name=f'Stock rush {tag}')
+        item = MenuItem.objects.create(
+            canteen=canteen, name='Last units', price=10, stock_quantity=stock
+        )
+        User.objects.bulk_create([
+            User(email=f'rush-{tag}-{n}@example.com', firebase_uid=f'rush-{tag}-{n}')
+            for n in range(orders)
+        ])
+        users = list(User.objects.filter(firebase_uid__startswith=f'rush-{tag}-'))
+
+        view = OrderCreateView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        body = {'canteen_id': canteen.pk, 'items': [{'menu_item_id': item.pk, 'quantity': quantity}]}
+        barrier = threading.Barrier(len(users))
+        results = Counter()
+        lock = threading.Lock()
+
+        def place_order(user):
+            request = factory.post('/api/orders/create/', body, format='json')
+            force_authenticate(request, user=user)
+            barrier.wait()
+            try:
+                for attempt in range(100):
+                    try:
+                        code = view(request).status_code
+                        break
+                    except OperationalError as e:
+                        # SQLite allows one writer at a time and fails the
+                        # others instead of queueing them
+                        code = type(e).__name__
+                        time.sleep(random.uniform(0.005, 0.05))
+            except Exception as e:
+                code = type(e).__name__
+            finally:
+                connection.close()
+            with lock:
+                results[code] += 1
+
+        threads = [threading.Thread(target=place_order, args=(user,)) for user in users]
+        started = time.monotonic()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+
+            item.refresh_from_db()
+            sold = sum(OrderItem.objects.filter(menu_item=item).values_list('quantity', flat=True))
+        finally:
+            canteen.delete()
+            User.objects.filter(firebase_uid__startswith=f'rush-{tag}-').delete()
+
+        summary = ', '.join(f'{code}: {count}' for code, count in sorted(results.items(), key=str))
+        self.stdout.write(f'{len(users)} orders in {elapsed:.2f}s ({summary})')
+        self.stdout.write(
+            f'Sold {sold} of {stock} units, {item.stock_quantity} left, '
+            f'available={item.is_available}'
+        )
+
+        expected = stock - stock % quantity if orders * quantity >= stock else orders * quantity
+        if sold != expected or sold + item.stock_quantity != stock:
+            raise CommandError(f'Stock mismatch: expected {expected} units sold')
+        if item.stock_quantity == 0 and item.is_available:
+            raise CommandError('Item is sold out but still marked available')
+        self.stdout.write(self.style.SUCCESS('No units oversold'))
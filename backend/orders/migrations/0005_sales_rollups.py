@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canteen', '0009_hot_query_indexes'),
+        ('orders', '0004_archived_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanteenHourlySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('completed_orders', models.IntegerField(default=0)),
+                ('cancelled_orders', models.IntegerField(default=0)),
+                ('hour', models.DateTimeField()),
+                ('canteen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='canteen.canteen')),
+            ],
+            options={
+                'verbose_name_plural': 'Canteen hourly sales',
+                'ordering': ['hour'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CanteenDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('completed_orders', models.IntegerField(default=0)),
+                ('cancelled_orders', models.IntegerField(default=0)),
+                ('date', models.DateField()),
+                ('canteen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='canteen.canteen')),
+            ],
+            options={
+                'verbose_name_plural': 'Canteen daily sales',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MenuItemDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('canteen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='canteen.canteen')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='canteen.menuitem')),
+            ],
+            options={
+                'verbose_name_plural': 'Menu item daily sales',
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['canteen', 'date'], name='menuitem_sales_canteen_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='menuitemdailysales',
+            constraint=models.UniqueConstraint(fields=('menu_item', 'date'), name='unique_menu_item_daily_sales'),
+        ),
+        migrations.AddConstraint(
+            model_name='canteenhourlysales',
+            constraint=models.UniqueConstraint(fields=('canteen', 'hour'), name='unique_canteen_hourly_sales'),
+        ),
+        migrations.AddConstraint(
+            model_name='canteendailysales',
+            constraint=models.UniqueConstraint(fields=('canteen', 'date'), name='unique_canteen_daily_sales'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canteen', '0010_pickup_slots'),
+        ('orders', '0005_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='pickup_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='canteen.pickupslot'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='prep_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,11 +1,15 @@
 """
 Models for orders app
 """
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
-from canteen.models import Canteen, MenuItem
-import uuid
+from canteen.models import Canteen, MenuItem, PickupSlot
+from .events import publish_order
+from .ids import new_id
+from decimal import Decimal
 
 
 class Order(models.Model):
@@ -20,6 +24,28 @@ class Order(models.Model):
         COMPLETED = 'completed', 'Completed'
         CANCELLED = 'cancelled', 'Cancelled'
     
+    # Statuses an order may move to from each status. Managers may skip
+    # ahead but never go back, and only unprepared orders can be cancelled.
+    TRANSITIONS = {
+        Status.PENDING: {Status.PAID, Status.CANCELLED},
+        Status.PAID: {
+            Status.CONFIRMED, Status.PREPARING, Status.READY,
+            Status.COMPLETED, Status.CANCELLED
+        },
+        Status.CONFIRMED: {Status.PREPARING, Status.READY, Status.COMPLETED},
+        Status.PREPARING: {Status.READY, Status.COMPLETED},
+        Status.READY: {Status.COMPLETED},
+        Status.COMPLETED: set(),
+        Status.CANCELLED: set(),
+    }
+    
+    # Timestamp set when an order enters these statuses
+    STATUS_TIMESTAMPS = {
+        Status.PAID: 'paid_at',
+        Status.CONFIRMED: 'confirmed_at',
+        Status.COMPLETED: 'completed_at',
+    }
+    
     # Unique order ID
     order_id = models.CharField(max_length=50, unique=True, editable=False)
     
@@ -48,6 +74,17 @@ class Order(models.Model):
     # Special instructions
     special_instructions = models.TextField(blank=True)
     
+    # Pickup slot booked for canteens that use them (see canteen.slots)
+    pickup_slot = models.ForeignKey(
+        PickupSlot,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='orders'
+    )
+    # Prep-minutes the order takes up in its slot
+    prep_minutes = models.PositiveIntegerField(default=0)
+    
     # QR Code tracking
     qr_code_used = models.BooleanField(default=False)
     qr_code_used_at = models.DateTimeField(null=True, blank=True)
@@ -61,6 +98,16 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # Order lists are paged on (created_at, id); see dp_canteen.pagination
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+            models.Index(fields=['canteen', 'created_at', 'id'], name='order_canteen_created_idx'),
+            models.Index(
+                fields=['canteen', 'status', 'created_at', 'id'],
+                name='order_canteen_status_idx'
+            ),
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.order_id:
@@ -68,38 +115,121 @@ class Order(models.Model):
         super().save(*args, **kwargs)
     
     def generate_order_id(self):
-        """Generate a unique order ID"""
-        timestamp = timezone.now().strftime('%Y%m%d%H%M')
-        unique = uuid.uuid4().hex[:6].upper()
-        return f'DP{timestamp}{unique}'
+        """Generate a unique, time-sortable order ID (see orders.ids)"""
+        return new_id('DP')
     
     def __str__(self):
         return f"Order {self.order_id} - {self.user.email}"
     
     def calculate_totals(self):
         """Calculate order totals from items"""
-        self.subtotal = sum(item.total_price for item in self.items.all())
+        self.set_totals(self.items.all())
+        self.save()
+    
+    def set_totals(self, items):
+        """Set totals from order items without saving"""
+        self.subtotal = sum((item.total_price for item in items), Decimal('0'))
         self.tax = self.subtotal * 0  # No tax for now, can be configured
         self.total_amount = self.subtotal + self.tax
-        self.save()
+    
+    @classmethod
+    def allowed_from(cls, status):
+        """Statuses that may move to ``status``"""
+        return [source for source, targets in cls.TRANSITIONS.items() if status in targets]
+    
+    def transition_to(self, status):
+        """
+        Move to ``status`` with one conditional UPDATE of the changed columns.
+        
+        Returns False, leaving the instance untouched, when the order's
+        current status in the database doesn't allow it: an invalid
+        transition or a concurrent writer that got there first. Successful
+        transitions update the sales rollups in the same transaction and are
+        published to order event streams on commit.
+        """
+        now = timezone.now()
+        values = {'status': status, 'updated_at': now}
+        if status in self.STATUS_TIMESTAMPS:
+            values[self.STATUS_TIMESTAMPS[status]] = now
+        with transaction.atomic():
+            updated = Order.objects.filter(
+                pk=self.pk,
+                status__in=self.allowed_from(status)
+            ).update(**values)
+            if not updated:
+                return False
+            for field, value in values.items():
+                setattr(self, field, value)
+            self.record_sale(status)
+        # .update() skips post_save, which publishes other changes
+        publish_order(self)
+        return True
+    
+    def record_sale(self, status):
+        """Add the order's move to ``status`` to the sales rollups"""
+        if status not in (self.Status.PAID, self.Status.COMPLETED, self.Status.CANCELLED):
+            return
+        if self.paid_at is None:
+            # Another request may have paid the order since it was loaded
+            self.paid_at = Order.objects.filter(pk=self.pk).values_list('paid_at', flat=True).get()
+            if self.paid_at is None:
+                # Cancelled before payment; never a sale
+                return
+        
+        if status == self.Status.COMPLETED:
+            deltas = {'completed_orders': 1}
+        elif status == self.Status.PAID:
+            deltas = {'orders': 1, 'revenue': self.total_amount}
+        else:
+            deltas = {'orders': -1, 'revenue': -self.total_amount, 'cancelled_orders': 1}
+        paid_at = timezone.localtime(self.paid_at)
+        hour = paid_at.replace(minute=0, second=0, microsecond=0)
+        CanteenDailySales.add({'canteen_id': self.canteen_id, 'date': paid_at.date()}, **deltas)
+        CanteenHourlySales.add({'canteen_id': self.canteen_id, 'hour': hour}, **deltas)
+        if status == self.Status.COMPLETED:
+            return
+        
+        sign = 1 if status == self.Status.PAID else -1
+        sold = {}
+        lines = self.items.filter(menu_item__isnull=False).values_list(
+            'menu_item_id', 'quantity', 'item_price'
+        )
+        for menu_item_id, quantity, price in lines:
+            units, revenue = sold.get(menu_item_id, (0, Decimal('0')))
+            sold[menu_item_id] = units + quantity, revenue + quantity * price
+        # In a fixed order so concurrent orders lock rows alike
+        for menu_item_id, (units, revenue) in sorted(sold.items()):
+            MenuItemDailySales.add(
+                {'menu_item_id': menu_item_id, 'date': paid_at.date()},
+                {'canteen_id': self.canteen_id},
+                quantity=sign * units,
+                revenue=sign * revenue
+            )
     
     def mark_as_paid(self):
-        """Mark order as paid"""
-        self.status = self.Status.PAID
-        self.paid_at = timezone.now()
-        self.save()
+        """Mark order as paid; False if it was no longer pending"""
+        return self.transition_to(self.Status.PAID)
     
     def confirm_order(self):
-        """Confirm the order"""
-        self.status = self.Status.CONFIRMED
-        self.confirmed_at = timezone.now()
-        self.save()
+        """Confirm the order; False if it was no longer paid"""
+        return self.transition_to(self.Status.CONFIRMED)
     
     def mark_qr_used(self):
-        """Mark QR code as used"""
+        """Mark QR code as used; False if it was already used or the order closed"""
+        now = timezone.now()
+        updated = Order.objects.filter(
+            pk=self.pk,
+            qr_code_used=False
+        ).exclude(
+            status__in=[self.Status.PENDING, self.Status.COMPLETED, self.Status.CANCELLED]
+        ).update(qr_code_used=True, qr_code_used_at=now, updated_at=now)
+        if not updated:
+            return False
         self.qr_code_used = True
-        self.qr_code_used_at = timezone.now()
-        self.save()
+        self.qr_code_used_at = now
+        self.updated_at = now
+        publish_order(self)
+        return True
 
 
 class OrderItem(models.Model):
@@ -142,3 +272,173 @@ class OrderItem(models.Model):
             self.item_name = self.menu_item.name
             self.item_price = self.menu_item.price
         super().save(*args, **kwargs)
+
+
+class IdNode(models.Model):
+    """A process that makes order and payment IDs; its pk is the ID node number"""
+    
+    hostname = models.CharField(max_length=255)
+    pid = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Node {self.pk} ({self.hostname}:{self.pid})"
+
+
+class IdempotencyKey(models.Model):
+    """Stored response for a request sent with an Idempotency-Key header"""
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    
+    # Hash of the method, path and body the key was first used with
+    fingerprint = models.CharField(max_length=64)
+    
+    # Filled in before the first request commits
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+
+class ArchivedOrder(models.Model):
+    """
+    A completed or cancelled order moved out of the hot tables.
+    
+    Keeps the original order's primary key, so archived and live orders
+    page together on (created_at, id). ``summary`` and ``data`` hold the
+    order as the list and detail endpoints returned it; ``data`` also keeps
+    the raw order, item, payment and QR code rows.
+    """
+    
+    id = models.BigIntegerField(primary_key=True)
+    order_id = models.CharField(max_length=50, unique=True)
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_orders'
+    )
+    canteen = models.ForeignKey(
+        Canteen,
+        on_delete=models.CASCADE,
+        related_name='archived_orders'
+    )
+    status = models.CharField(max_length=20, choices=Order.Status.choices)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    summary = models.JSONField(encoder=DjangoJSONEncoder)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='archived_user_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Archived order {self.order_id}"
+
+
+class Rollup(models.Model):
+    """Base for rollup tables updated with concurrent increments"""
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def add(cls, keys, defaults=None, **deltas):
+        """Add ``deltas`` to the row for ``keys``, creating it with ``defaults`` if needed"""
+        changes = {field: F(field) + delta for field, delta in deltas.items()}
+        if cls.objects.filter(**keys).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(**keys, **(defaults or {}), **deltas)
+        except IntegrityError:
+            # Another transaction created the row first
+            cls.objects.filter(**keys).update(**changes)
+
+
+class SalesRollup(Rollup):
+    """
+    A canteen's running sales totals for one period.
+    
+    Sales count from when an order is paid and are bucketed by its local
+    ``paid_at``. A paid order that is later cancelled is taken back out of
+    ``orders`` and ``revenue`` and counted in ``cancelled_orders``.
+    """
+    
+    canteen = models.ForeignKey(Canteen, on_delete=models.CASCADE, related_name='+')
+    
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    completed_orders = models.IntegerField(default=0)
+    cancelled_orders = models.IntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+
+
+class CanteenDailySales(SalesRollup):
+    """A canteen's sales per local day"""
+    
+    date = models.DateField()
+    
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'Canteen daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['canteen', 'date'], name='unique_canteen_daily_sales'),
+        ]
+
+
+class CanteenHourlySales(SalesRollup):
+    """A canteen's sales per local hour"""
+    
+    # Start of the hour
+    hour = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['hour']
+        verbose_name_plural = 'Canteen hourly sales'
+        constraints = [
+            models.UniqueConstraint(fields=['canteen', 'hour'], name='unique_canteen_hourly_sales'),
+        ]
+
+
+class MenuItemDailySales(Rollup):
+    """Units of a menu item sold per local day, net of cancellations"""
+    
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    canteen = models.ForeignKey(Canteen, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'Menu item daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'date'], name='unique_menu_item_daily_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['canteen', 'date'], name='menuitem_sales_canteen_idx'),
+        ]
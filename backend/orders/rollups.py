@@ -0,0 +1,170 @@
+"""
+Bulk rebuild of the sales rollups
+
+Order transitions keep the rollups current (see ``Order.record_sale``).
+Rebuilding recomputes them from every paid order, live and archived, for
+history from before the rollups existed or after they drift (a status
+changed with raw SQL, say).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from canteen.models import MenuItem
+from .models import (
+    ArchivedOrder, CanteenDailySales, CanteenHourlySales, MenuItemDailySales,
+    Order, OrderItem
+)
+
+SALES_FIELDS = ['orders', 'revenue', 'completed_orders', 'cancelled_orders']
+
+
+class Totals:
+    """Rollup rows being rebuilt, keyed like their unique constraints"""
+
+    def __init__(self):
+        self.hourly = defaultdict(lambda: dict.fromkeys(SALES_FIELDS, 0))
+        self.items = defaultdict(lambda: {'quantity': 0, 'revenue': Decimal('0')})
+
+    def add_hour(self, canteen_id, hour, **values):
+        row = self.hourly[canteen_id, hour]
+        for field, value in values.items():
+            row[field] += value
+
+    def add_item(self, menu_item_id, canteen_id, date, quantity, revenue):
+        row = self.items[menu_item_id, canteen_id, date]
+        row['quantity'] += quantity
+        row['revenue'] += revenue
+
+    def daily(self):
+        days = defaultdict(lambda: dict.fromkeys(SALES_FIELDS, 0))
+        for (canteen_id, hour), values in self.hourly.items():
+            row = days[canteen_id, timezone.localtime(hour).date()]
+            for field, value in values.items():
+                row[field] += value
+        return days
+
+
+def sale_values(status, total_amount):
+    """A paid order's contribution to its canteen's sales"""
+    if status == Order.Status.CANCELLED:
+        return {'cancelled_orders': 1}
+    return {
+        'orders': 1,
+        'revenue': total_amount,
+        'completed_orders': int(status == Order.Status.COMPLETED),
+    }
+
+
+def add_live_orders(totals, canteen_id=None):
+    """Aggregate live orders and their items in the database"""
+    orders = Order.objects.filter(paid_at__isnull=False)
+    items = OrderItem.objects.filter(
+        order__paid_at__isnull=False,
+        menu_item__isnull=False
+    ).exclude(order__status=Order.Status.CANCELLED)
+    if canteen_id is not None:
+        orders = orders.filter(canteen_id=canteen_id)
+        items = items.filter(order__canteen_id=canteen_id)
+
+    sold = ~Q(status=Order.Status.CANCELLED)
+    hourly = orders.annotate(hour=TruncHour('paid_at')).values('canteen_id', 'hour').annotate(
+        sold_orders=Count('id', filter=sold),
+        sold_revenue=Sum('total_amount', filter=sold),
+        completed=Count('id', filter=Q(status=Order.Status.COMPLETED)),
+        cancelled=Count('id', filter=Q(status=Order.Status.CANCELLED)),
+    ).order_by()
+    for row in hourly:
+        totals.add_hour(
+            row['canteen_id'],
+            timezone.localtime(row['hour']),
+            orders=row['sold_orders'],
+            revenue=row['sold_revenue'] or 0,
+            completed_orders=row['completed'],
+            cancelled_orders=row['cancelled']
+        )
+
+    item_rows = items.annotate(date=TruncDate('order__paid_at')).values(
+        'menu_item_id', 'order__canteen_id', 'date'
+    ).annotate(
+        units=Sum('quantity'),
+        revenue=Sum(F('quantity') * F('item_price'))
+    ).order_by()
+    for row in item_rows:
+        totals.add_item(
+            row['menu_item_id'],
+            row['order__canteen_id'],
+            row['date'],
+            row['units'],
+            row['revenue']
+        )
+
+
+def add_archived_orders(totals, canteen_id=None):
+    """Add archived orders from the rows they were archived with"""
+    archived = ArchivedOrder.objects.all()
+    if canteen_id is not None:
+        archived = archived.filter(canteen_id=canteen_id)
+    for rows in archived.values_list('data__rows', flat=True).iterator(chunk_size=1000):
+        order = rows['order']
+        paid_at = order['paid_at'] and parse_datetime(order['paid_at'])
+        if paid_at is None:
+            continue
+        paid_at = timezone.localtime(paid_at)
+        total_amount = Decimal(order['total_amount'])
+        totals.add_hour(
+            order['canteen_id'],
+            paid_at.replace(minute=0, second=0, microsecond=0),
+            **sale_values(order['status'], total_amount)
+        )
+        if order['status'] == Order.Status.CANCELLED:
+            continue
+        for item in rows['items']:
+            if item['menu_item_id'] is not None:
+                totals.add_item(
+                    item['menu_item_id'],
+                    order['canteen_id'],
+                    paid_at.date(),
+                    item['quantity'],
+                    item['quantity'] * Decimal(item['item_price'])
+                )
+
+
+def rebuild_sales_rollups(canteen_id=None, batch_size=1000):
+    """
+    Replace the rollups of one or every canteen with freshly computed ones.
+
+    Returns the number of daily, hourly and menu item rows written.
+    """
+    totals = Totals()
+    with transaction.atomic():
+        add_live_orders(totals, canteen_id)
+        add_archived_orders(totals, canteen_id)
+
+        scope = {} if canteen_id is None else {'canteen_id': canteen_id}
+        for model in (CanteenDailySales, CanteenHourlySales, MenuItemDailySales):
+            model.objects.filter(**scope).delete()
+
+        # Archived rows keep the ids of menu items deleted since; live order
+        # items had theirs set to NULL, so leave those sales out likewise
+        item_ids = {menu_item for menu_item, _, _ in totals.items}
+        existing = set(MenuItem.objects.filter(pk__in=item_ids).values_list('pk', flat=True))
+
+        daily = CanteenDailySales.objects.bulk_create([
+            CanteenDailySales(canteen_id=canteen, date=date, **values)
+            for (canteen, date), values in totals.daily().items()
+        ], batch_size=batch_size)
+        hourly = CanteenHourlySales.objects.bulk_create([
+            CanteenHourlySales(canteen_id=canteen, hour=hour, **values)
+            for (canteen, hour), values in totals.hourly.items()
+        ], batch_size=batch_size)
+        items = MenuItemDailySales.objects.bulk_create([
+            MenuItemDailySales(menu_item_id=menu_item, canteen_id=canteen, date=date, **values)
+            for (menu_item, canteen, date), values in totals.items.items()
+            if menu_item in existing
+        ], batch_size=batch_size)
+    return len(daily), len(hourly), len(items)
@@ -2,7 +2,7 @@
 Serializers for orders app
 """
 from rest_framework import serializers
-from .models import Order, OrderItem
+from .models import CanteenDailySales, CanteenHourlySales, Order, OrderItem
 from canteen.models import MenuItem
 
 
@@ -40,6 +40,7 @@ class OrderSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.name', read_only=True)
     canteen_name = serializers.CharField(source='canteen.name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    pickup_at = serializers.DateTimeField(source='pickup_slot.starts_at', read_only=True, allow_null=True)
     
     class Meta:
         model = Order
@@ -47,13 +48,14 @@ class OrderSerializer(serializers.ModelSerializer):
             'id', 'order_id', 'user', 'user_email', 'user_name',
             'canteen', 'canteen_name', 'status', 'status_display',
             'subtotal', 'tax', 'total_amount', 'special_instructions',
+            'pickup_at', 'prep_minutes',
             'qr_code_used', 'items', 'created_at', 'updated_at',
             'paid_at', 'confirmed_at', 'completed_at'
         ]
         read_only_fields = [
             'id', 'order_id', 'user', 'subtotal', 'tax', 'total_amount',
-            'qr_code_used', 'created_at', 'updated_at', 'paid_at',
-            'confirmed_at', 'completed_at'
+            'prep_minutes', 'qr_code_used', 'created_at', 'updated_at',
+            'paid_at', 'confirmed_at', 'completed_at'
         ]
 
 
@@ -63,15 +65,19 @@ class OrderListSerializer(serializers.ModelSerializer):
     canteen_name = serializers.CharField(source='canteen.name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     items_count = serializers.SerializerMethodField()
+    pickup_at = serializers.DateTimeField(source='pickup_slot.starts_at', read_only=True, allow_null=True)
     
     class Meta:
         model = Order
         fields = [
             'id', 'order_id', 'canteen_name', 'status', 'status_display',
-            'total_amount', 'items_count', 'created_at'
+            'total_amount', 'items_count', 'pickup_at', 'created_at'
         ]
     
     def get_items_count(self, obj):
+        # Annotated by the list views
+        if hasattr(obj, 'items_count'):
+            return obj.items_count
         return obj.items.count()
 
 
@@ -81,6 +87,8 @@ class OrderCreateSerializer(serializers.Serializer):
     canteen_id = serializers.IntegerField()
     items = OrderItemCreateSerializer(many=True)
     special_instructions = serializers.CharField(required=False, allow_blank=True)
+    # Start of a pickup slot; the earliest free one if left out
+    pickup_slot = serializers.DateTimeField(required=False)
     
     def validate_items(self, value):
         if not value:
@@ -100,3 +108,35 @@ class OrderStatusUpdateSerializer(serializers.Serializer):
     """Serializer for updating order status"""
     
     status = serializers.ChoiceField(choices=Order.Status.choices)
+
+
+class SalesTotalsSerializer(serializers.ModelSerializer):
+    """Serializer for a canteen's sales over a period"""
+    
+    class Meta:
+        model = CanteenDailySales
+        fields = ['orders', 'revenue', 'completed_orders', 'cancelled_orders']
+
+
+class DailySalesSerializer(SalesTotalsSerializer):
+    """Serializer for a canteen's sales on one day"""
+    
+    class Meta(SalesTotalsSerializer.Meta):
+        fields = ['date', *SalesTotalsSerializer.Meta.fields]
+
+
+class HourlySalesSerializer(SalesTotalsSerializer):
+    """Serializer for a canteen's sales in one hour"""
+    
+    class Meta(SalesTotalsSerializer.Meta):
+        model = CanteenHourlySales
+        fields = ['hour', *SalesTotalsSerializer.Meta.fields]
+
+
+class ItemSalesSerializer(serializers.Serializer):
+    """Serializer for a menu item's sales over a report's days"""
+    
+    menu_item = serializers.IntegerField(source='menu_item_id')
+    name = serializers.CharField(source='menu_item__name')
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
@@ -0,0 +1,14 @@
+"""
+Signal handlers for orders app
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .events import publish_order
+from .models import Order
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    publish_order(instance)
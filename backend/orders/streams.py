@@ -0,0 +1,176 @@
+"""
+Server-Sent Events stream of order status changes
+
+``GET /api/orders/events/`` streams a customer's own orders, and
+``?canteen=<id>`` a manager's canteen queue, as ``order`` events. Browsers'
+EventSource (and SSE clients on mobile) reconnect on their own and send the
+last event id back in ``Last-Event-ID``; the stream then replays changes
+made since from the orders table before going live. A client that falls
+too far behind gets a ``reset`` event and should refetch its order list.
+
+Streams stay open only under ASGI, so they are served by a separate
+``events`` process running ``dp_canteen.asgi``; the web process stays on
+WSGI. A WSGI worker answers with the replay and closes the stream, so
+clients fall back to reconnecting every RETRY_MS instead of tying up the
+worker. Opening a stream counts against the ``order_events`` throttle
+scope.
+"""
+import asyncio
+import json
+import math
+from datetime import timedelta
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from dp_canteen.throttling import ScopedSlidingWindowThrottle
+from .events import broker, order_event, parse_event_id
+from .models import Order
+
+# Reconnect delay suggested to clients
+RETRY_MS = 3000
+
+# Comment line sent when idle so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+
+# Orders whose transactions commit out of updated_at order can be missed by
+# a strict "after the last event" replay, so replay a little further back
+REPLAY_OVERLAP = timedelta(seconds=5)
+REPLAY_LIMIT = 200
+
+
+def authenticate(request):
+    """``(user, seconds to wait)``; the user is None if not authenticated"""
+    drf_request = Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except APIException:
+        return None, None
+    if not user.is_authenticated:
+        return None, None
+
+    # Not a REST framework view, so apply its scoped throttle here
+    throttle = ScopedSlidingWindowThrottle()
+    if throttle.allow_request(drf_request, SimpleNamespace(throttle_scope='order_events')):
+        return user, None
+    return user, throttle.wait()
+
+
+def stream_scope(user, canteen_id):
+    """``(order filters, channel)`` the user may stream, or None"""
+    if canteen_id is None:
+        return {'user_id': user.pk}, f'user:{user.pk}'
+    try:
+        canteen_id = int(canteen_id)
+    except ValueError:
+        return None
+    if not (
+        user.is_superuser or user.role == 'admin'
+        or (user.role == 'manager' and user.managed_canteen_id == canteen_id)
+    ):
+        return None
+    return {'canteen_id': canteen_id}, f'canteen:{canteen_id}'
+
+
+def replay_events(filters, last_event):
+    """Events for orders changed since ``last_event``; None if there are too many"""
+    updated_at = last_event[0]
+    orders = Order.objects.filter(
+        updated_at__gte=updated_at - REPLAY_OVERLAP,
+        **filters
+    ).order_by('updated_at', 'pk')[:REPLAY_LIMIT + 1]
+    events = [order_event(order) for order in orders]
+    if len(events) > REPLAY_LIMIT:
+        return None
+    return events
+
+
+def format_event(event_type, data, event_id=None):
+    lines = [f'event: {event_type}', f'data: {json.dumps(data)}']
+    if event_id:
+        lines.insert(0, f'id: {event_id}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def event_stream(filters, channel, last_event, live):
+    subscription = None
+    if live:
+        # Subscribe before replaying so nothing falls between the two
+        subscription = broker.subscribe([channel])
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        if last_event is not None:
+            events = await sync_to_async(replay_events)(filters, last_event)
+            if events is None:
+                yield format_event('reset', {})
+                events = []
+            for event in events:
+                yield format_event('order', event, event['id'])
+        if not live:
+            return
+
+        # Bounded, because Django 4.2 doesn't notice closed connections
+        # until a write fails; the client just reconnects
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.ORDER_EVENTS_MAX_AGE
+        while not subscription.overflowed:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                event = await subscription.get(min(HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event('order', event, event['id'])
+    finally:
+        if subscription is not None:
+            subscription.close()
+
+
+async def order_events(request):
+    """Stream status changes of the user's orders, or a canteen's queue"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    user, wait = await sync_to_async(authenticate)(request)
+    if user is None:
+        return JsonResponse(
+            {'error': 'Authentication credentials were not provided or are invalid'},
+            status=401
+        )
+    if wait is not None:
+        response = JsonResponse(
+            {'error': 'Too many event stream connections, try again later'},
+            status=429
+        )
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+    scope = stream_scope(user, request.GET.get('canteen'))
+    if scope is None:
+        return JsonResponse(
+            {'error': 'You do not have permission to follow this canteen'},
+            status=403
+        )
+    filters, channel = scope
+
+    last_event = parse_event_id(
+        request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    )
+    if isinstance(request, ASGIRequest):
+        stream = event_stream(filters, channel, last_event, live=True)
+    else:
+        # WSGI serves responses synchronously, so hand it the finished replay
+        stream = [chunk async for chunk in event_stream(filters, channel, last_event, live=False)]
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -2,7 +2,7 @@
 URL patterns for orders app
 """
 from django.urls import path
-from . import views
+from . import streams, views
 
 app_name = 'orders'
 
@@ -10,10 +10,16 @@ urlpatterns = [
     # Customer endpoints
     path('', views.OrderListView.as_view(), name='order-list'),
     path('create/', views.OrderCreateView.as_view(), name='order-create'),
+    path('events/', streams.order_events, name='order-events'),
     path('<str:order_id>/', views.OrderDetailView.as_view(), name='order-detail'),
     path('<str:order_id>/cancel/', views.cancel_order, name='order-cancel'),
     
     # Manager endpoints
     path('manager/list/', views.ManagerOrderListView.as_view(), name='manager-order-list'),
     path('manager/<str:order_id>/status/', views.update_order_status, name='order-status-update'),
+    
+    # Manager sales reports
+    path('manager/reports/daily/', views.daily_sales_report, name='sales-report-daily'),
+    path('manager/reports/hourly/', views.hourly_sales_report, name='sales-report-hourly'),
+    path('manager/reports/items/', views.item_sales_report, name='sales-report-items'),
 ]
@@ -1,28 +1,66 @@
 """
 Views for orders app
 """
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from .models import Order, OrderItem
+from .idempotency import IdempotentMixin
+from .models import (
+    ArchivedOrder, CanteenDailySales, CanteenHourlySales, MenuItemDailySales,
+    Order, OrderItem
+)
 from .serializers import (
     OrderSerializer, OrderListSerializer, OrderCreateSerializer,
-    OrderStatusUpdateSerializer
+    OrderStatusUpdateSerializer, SalesTotalsSerializer, DailySalesSerializer,
+    HourlySalesSerializer, ItemSalesSerializer
 )
 from canteen.models import Canteen, MenuItem
+from canteen.slots import is_slot_start, release_slot, reserve_earliest_slot, reserve_slot
+from canteen.stock import release_stock, reserve_stock
 from accounts.permissions import IsManager, IsManagerOrAdmin, IsCustomer
+from dp_canteen.conditional import ConditionalGetMixin
+from dp_canteen.pagination import KeysetPagination
+
+
+def with_list_fields(queryset):
+    """Load what OrderListSerializer reads without a query per order"""
+    # A correlated subquery rather than a join + GROUP BY, so only the
+    # page's rows are counted
+    items_count = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values(
+        'order'
+    ).annotate(count=Count('id')).values('count')
+    return queryset.select_related('canteen', 'pickup_slot').annotate(
+        items_count=Coalesce(Subquery(items_count), Value(0))
+    )
+
+
+def orders_visible_to(user, model=Order):
+    """Live or archived orders the user may view: all, their canteen's, or their own"""
+    if user.is_superuser or user.role == 'admin':
+        return model.objects.all()
+    if user.role == 'manager' and user.managed_canteen:
+        return model.objects.filter(canteen=user.managed_canteen)
+    return model.objects.filter(user=user)
 
 
 class OrderListView(generics.ListAPIView):
-    """List orders for the current user"""
+    """List orders for the current user, falling through to archived ones"""
     serializer_class = OrderListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         user = self.request.user
-        queryset = Order.objects.filter(user=user)
+        queryset = with_list_fields(Order.objects.filter(user=user))
         
         # Filter by status if provided
         status_filter = self.request.query_params.get('status')
@@ -30,26 +68,80 @@ class OrderListView(generics.ListAPIView):
             queryset = queryset.filter(status=status_filter)
         
         return queryset
+    
+    def get_archived_queryset(self):
+        queryset = ArchivedOrder.objects.filter(user=self.request.user).defer('data')
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        orders = self.filter_queryset(self.get_queryset())
+        if hasattr(self.paginator, 'paginate_querysets'):
+            page = self.paginator.paginate_querysets(
+                [orders, self.get_archived_queryset()], request, view=self
+            )
+        else:
+            # Other paginators can only page through live orders
+            page = self.paginate_queryset(orders)
+        
+        # Archived orders keep the summary they were listed with
+        live = iter(self.get_serializer(
+            [row for row in page if isinstance(row, Order)], many=True
+        ).data)
+        results = [
+            row.summary if isinstance(row, ArchivedOrder) else next(live)
+            for row in page
+        ]
+        return self.get_paginated_response(results)
 
 
-class OrderDetailView(generics.RetrieveAPIView):
-    """Get order details"""
+class OrderDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """Get order details, including archived orders"""
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'order_id'
+    # Per-user data: clients may keep it but must revalidate every time
+    cache_control = {'private': True, 'no_cache': True}
     
     def get_queryset(self):
-        user = self.request.user
-        if user.is_superuser or user.role == 'admin':
-            return Order.objects.all()
-        if user.role == 'manager' and user.managed_canteen:
-            return Order.objects.filter(canteen=user.managed_canteen)
-        return Order.objects.filter(user=user)
+        return orders_visible_to(self.request.user)
+    
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived = get_object_or_404(
+                orders_visible_to(request.user, ArchivedOrder),
+                order_id=kwargs['order_id']
+            )
+            return Response(archived.data['order'])
+    
+    def get_last_modified(self, request, order_id):
+        if not hasattr(self, '_updated_at'):
+            self._updated_at = self.get_queryset().filter(order_id=order_id).values_list(
+                'updated_at', flat=True
+            ).first()
+            if self._updated_at is None:
+                # Archived orders don't change once archived
+                self._updated_at = orders_visible_to(request.user, ArchivedOrder).filter(
+                    order_id=order_id
+                ).values_list('archived_at', flat=True).first()
+        return self._updated_at
+    
+    def get_version(self, request, order_id):
+        updated_at = self.get_last_modified(request, order_id)
+        if updated_at is None:
+            return None
+        return order_id, updated_at
 
 
-class OrderCreateView(generics.CreateAPIView):
+class OrderCreateView(IdempotentMixin, generics.CreateAPIView):
     """Create a new order"""
     serializer_class = OrderCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'order_create'
     
     @transaction.atomic
     def create(self, request, *args, **kwargs):
@@ -58,37 +150,81 @@ class OrderCreateView(generics.CreateAPIView):
         
         data = serializer.validated_data
         canteen = Canteen.objects.get(pk=data['canteen_id'])
+        lines = data['items']
         
-        # Create order
-        order = Order.objects.create(
+        # One query for every item in the cart
+        menu_items = MenuItem.objects.filter(canteen=canteen).in_bulk(
+            {line['menu_item_id'] for line in lines}
+        )
+        
+        unavailable = []
+        for line in lines:
+            menu_item = menu_items.get(line['menu_item_id'])
+            if menu_item is None:
+                unavailable.append({'menu_item_id': line['menu_item_id'], 'reason': 'not_found'})
+            elif not (menu_item.is_active and menu_item.is_available):
+                unavailable.append({
+                    'menu_item_id': menu_item.pk,
+                    'name': menu_item.name,
+                    'reason': 'unavailable'
+                })
+        if unavailable:
+            return unavailable_items_response(unavailable)
+        
+        # Reserve stock once per tracked item, however many lines it is on
+        quantities = {}
+        for line in lines:
+            quantities[line['menu_item_id']] = quantities.get(line['menu_item_id'], 0) + line['quantity']
+        for menu_item_id, quantity in sorted(quantities.items()):
+            menu_item = menu_items[menu_item_id]
+            if menu_item.stock_quantity is not None and not reserve_stock(menu_item, quantity):
+                unavailable.append({
+                    'menu_item_id': menu_item.pk,
+                    'name': menu_item.name,
+                    'reason': 'out_of_stock',
+                    'requested': quantity
+                })
+        if unavailable:
+            transaction.set_rollback(True)
+            return unavailable_items_response(unavailable)
+        
+        # Book the kitchen time in a pickup slot, for canteens that use them
+        prep_minutes = sum(
+            menu_items[menu_item_id].prep_time * quantity
+            for menu_item_id, quantity in quantities.items()
+        )
+        pickup_slot = None
+        if canteen.pickup_slot_minutes:
+            pickup_slot, error = book_pickup_slot(canteen, data.get('pickup_slot'), prep_minutes)
+            if error is not None:
+                transaction.set_rollback(True)
+                return error
+        
+        order_items = [
+            OrderItem(
+                menu_item=menu_items[line['menu_item_id']],
+                item_name=menu_items[line['menu_item_id']].name,
+                item_price=menu_items[line['menu_item_id']].price,
+                quantity=line['quantity'],
+                special_instructions=line.get('special_instructions', '')
+            )
+            for line in lines
+        ]
+        
+        # Totals are known up front, so the order row is written once
+        order = Order(
             user=request.user,
             canteen=canteen,
-            special_instructions=data.get('special_instructions', '')
+            special_instructions=data.get('special_instructions', ''),
+            pickup_slot=pickup_slot,
+            prep_minutes=prep_minutes
         )
+        order.set_totals(order_items)
+        order.save()
         
-        # Create order items
-        for item_data in data['items']:
-            try:
-                menu_item = MenuItem.objects.get(
-                    pk=item_data['menu_item_id'],
-                    canteen=canteen,
-                    is_active=True,
-                    is_available=True
-                )
-                OrderItem.objects.create(
-                    order=order,
-                    menu_item=menu_item,
-                    item_name=menu_item.name,
-                    item_price=menu_item.price,
-                    quantity=item_data['quantity'],
-                    special_instructions=item_data.get('special_instructions', '')
-                )
-            except MenuItem.DoesNotExist:
-                # Rollback transaction
-                raise ValueError(f"Menu item {item_data['menu_item_id']} not available")
-        
-        # Calculate totals
-        order.calculate_totals()
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
         
         response_serializer = OrderSerializer(order)
         return Response({
@@ -98,11 +234,44 @@ class OrderCreateView(generics.CreateAPIView):
         }, status=status.HTTP_201_CREATED)
 
 
+def book_pickup_slot(canteen, starts_at, prep_minutes):
+    """``(slot, None)`` with the order booked into a slot, or ``(None, error response)``"""
+    if starts_at is None:
+        slot = reserve_earliest_slot(canteen, prep_minutes)
+        if slot is None:
+            return None, Response(
+                {'error': 'All pickup slots are full'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return slot, None
+    
+    if not is_slot_start(canteen, starts_at):
+        return None, Response(
+            {'error': 'Not an open pickup slot of this canteen'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    slot = reserve_slot(canteen, starts_at, prep_minutes)
+    if slot is None:
+        return None, Response(
+            {'error': 'This pickup slot is full', 'pickup_slot': starts_at},
+            status=status.HTTP_409_CONFLICT
+        )
+    return slot, None
+
+
+def unavailable_items_response(unavailable):
+    return Response({
+        'error': 'Some items in your order are not available',
+        'unavailable_items': unavailable
+    }, status=status.HTTP_409_CONFLICT)
+
+
 # Manager views
 class ManagerOrderListView(generics.ListAPIView):
     """List orders for manager's canteen"""
     serializer_class = OrderListSerializer
     permission_classes = [permissions.IsAuthenticated, IsManagerOrAdmin]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         user = self.request.user
@@ -112,16 +281,23 @@ class ManagerOrderListView(generics.ListAPIView):
             queryset = Order.objects.filter(canteen=user.managed_canteen)
         else:
             queryset = Order.objects.none()
+        queryset = with_list_fields(queryset)
         
         # Filter by status
         status_filter = self.request.query_params.get('status')
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Filter by date
+        # Filter by date, as a created_at range so the indexes apply
         date_filter = self.request.query_params.get('date')
         if date_filter:
-            queryset = queryset.filter(created_at__date=date_filter)
+            try:
+                day = date.fromisoformat(date_filter)
+            except ValueError:
+                raise ValidationError({'date': 'Use the YYYY-MM-DD format'})
+            start = timezone.make_aware(datetime.combine(day, time.min))
+            end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+            queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
         
         return queryset
 
@@ -148,15 +324,12 @@ def update_order_status(request, order_id):
         new_status = serializer.validated_data['status']
         old_status = order.status
         
-        order.status = new_status
-        
-        # Update timestamps based on status change
-        if new_status == Order.Status.CONFIRMED:
-            order.confirmed_at = timezone.now()
-        elif new_status == Order.Status.COMPLETED:
-            order.completed_at = timezone.now()
-        
-        order.save()
+        if new_status == Order.Status.CANCELLED:
+            changed = cancel(order)
+        else:
+            changed = order.transition_to(new_status)
+        if not changed:
+            return transition_conflict_response(order, new_status)
         
         return Response({
             'success': True,
@@ -185,14 +358,8 @@ def cancel_order(request, order_id):
             order = Order.objects.get(order_id=order_id, user=user)
         
         # Can only cancel pending or paid orders
-        if order.status not in [Order.Status.PENDING, Order.Status.PAID]:
-            return Response(
-                {'error': 'Cannot cancel order in current status'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        order.status = Order.Status.CANCELLED
-        order.save()
+        if not cancel(order):
+            return transition_conflict_response(order, Order.Status.CANCELLED)
         
         return Response({
             'success': True,
@@ -205,3 +372,164 @@ def cancel_order(request, order_id):
             {'error': 'Order not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+
+
+def cancel(order):
+    """Cancel ``order`` and return its stock and slot time; False if it can't be cancelled"""
+    with transaction.atomic():
+        # Only the request whose UPDATE wins gets past here, so stock is
+        # returned once however many cancels race
+        if not order.transition_to(Order.Status.CANCELLED):
+            return False
+        
+        tracked = order.items.filter(
+            menu_item__stock_quantity__isnull=False
+        ).values_list('menu_item_id', 'quantity')
+        for menu_item_id, quantity in tracked:
+            release_stock(menu_item_id, quantity)
+        
+        if order.pickup_slot_id:
+            release_slot(order.pickup_slot, order.prep_minutes)
+    return True
+
+
+def transition_conflict_response(order, new_status):
+    """409 for a status change the order's current status doesn't allow"""
+    order.refresh_from_db(fields=['status'])
+    return Response({
+        'error': f'Cannot change order from {order.status} to {new_status}',
+        'status': order.status,
+        'allowed_statuses': sorted(Order.TRANSITIONS[order.status]),
+    }, status=status.HTTP_409_CONFLICT)
+
+
+# Sales reports, answered from the rollup tables
+
+# Longest period a sales report may cover
+MAX_REPORT_DAYS = 366
+
+
+def report_canteen_id(request):
+    """Canteen a report is for: the manager's own, or ``?canteen=`` for admins"""
+    user = request.user
+    if not (user.is_superuser or user.role == 'admin'):
+        return user.managed_canteen_id
+    try:
+        return int(request.query_params['canteen'])
+    except KeyError:
+        raise ValidationError({'canteen': 'Choose a canteen to report on'})
+    except ValueError:
+        raise ValidationError({'canteen': 'Must be a canteen id'})
+
+
+def parse_date_param(request, name, default):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Use the YYYY-MM-DD format'})
+
+
+def report_period(request):
+    """``(first, last)`` day of ``?from=`` / ``?to=``, the last 30 days by default"""
+    last = parse_date_param(request, 'to', timezone.localdate())
+    first = parse_date_param(request, 'from', last - timedelta(days=29))
+    if first > last:
+        raise ValidationError({'from': 'Must not be after to'})
+    if (last - first).days >= MAX_REPORT_DAYS:
+        raise ValidationError({'from': f'Reports cover at most {MAX_REPORT_DAYS} days'})
+    return first, last
+
+
+def sales_totals(rows):
+    fields = SalesTotalsSerializer.Meta.fields
+    totals = CanteenDailySales(**{field: sum(getattr(row, field) for row in rows) for field in fields})
+    return SalesTotalsSerializer(totals).data
+
+
+def no_canteen_response():
+    return Response(
+        {'error': 'You are not assigned to a canteen'},
+        status=status.HTTP_403_FORBIDDEN
+    )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsManagerOrAdmin])
+def daily_sales_report(request):
+    """Sales per day of a canteen over a period (Manager only)"""
+    canteen_id = report_canteen_id(request)
+    if canteen_id is None:
+        return no_canteen_response()
+    first, last = report_period(request)
+    
+    rows = CanteenDailySales.objects.filter(canteen_id=canteen_id, date__range=(first, last))
+    rows = {row.date: row for row in rows}
+    days = [
+        rows.get(first + timedelta(days=n)) or CanteenDailySales(date=first + timedelta(days=n))
+        for n in range((last - first).days + 1)
+    ]
+    
+    return Response({
+        'canteen': canteen_id,
+        'from': first,
+        'to': last,
+        'totals': sales_totals(days),
+        'days': DailySalesSerializer(days, many=True).data
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsManagerOrAdmin])
+def hourly_sales_report(request):
+    """Sales per hour of a canteen on one day (Manager only)"""
+    canteen_id = report_canteen_id(request)
+    if canteen_id is None:
+        return no_canteen_response()
+    day = parse_date_param(request, 'date', timezone.localdate())
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    
+    rows = CanteenHourlySales.objects.filter(canteen_id=canteen_id, hour__gte=start, hour__lt=end)
+    rows = {row.hour: row for row in rows}
+    hours = []
+    # Step in UTC so days with a DST change get 23 or 25 hours
+    hour = start.astimezone(dt_timezone.utc)
+    while hour < end:
+        local_hour = timezone.localtime(hour)
+        hours.append(rows.get(hour) or CanteenHourlySales(hour=local_hour))
+        hour += timedelta(hours=1)
+    
+    return Response({
+        'canteen': canteen_id,
+        'date': day,
+        'totals': sales_totals(hours),
+        'hours': HourlySalesSerializer(hours, many=True).data
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, IsManagerOrAdmin])
+def item_sales_report(request):
+    """Units sold per menu item of a canteen over a period (Manager only)"""
+    canteen_id = report_canteen_id(request)
+    if canteen_id is None:
+        return no_canteen_response()
+    first, last = report_period(request)
+    
+    items = MenuItemDailySales.objects.filter(
+        canteen_id=canteen_id,
+        date__range=(first, last)
+    ).values('menu_item_id', 'menu_item__name').annotate(
+        quantity=Sum('quantity'),
+        revenue=Sum('revenue')
+    ).filter(quantity__gt=0).order_by('-quantity', 'menu_item__name')
+    
+    return Response({
+        'canteen': canteen_id,
+        'from': first,
+        'to': last,
+        'items': ItemSalesSerializer(items, many=True).data
+    })
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:28
+
+from django.db import migrations, models
+from dp_canteen.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='payment_user_created_idx'),
+        ),
+    ]
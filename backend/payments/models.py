@@ -3,8 +3,8 @@ Models for payments app
 """
 from django.db import models
 from django.conf import settings
+from orders.ids import new_id
 from orders.models import Order
-import uuid
 
 
 class Payment(models.Model):
@@ -63,10 +63,13 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='payment_user_created_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.payment_id:
-            self.payment_id = f'PAY{uuid.uuid4().hex[:12].upper()}'
+            self.payment_id = new_id('PAY')
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -13,18 +13,22 @@ from .serializers import (
     QRCodeSerializer, QRVerifySerializer, UPIIntentSerializer
 )
 from .encryption import create_encrypted_qr, verify_qr_data
+from orders.idempotency import idempotent
 from orders.models import Order
 from orders.serializers import OrderSerializer
 from accounts.permissions import IsManagerOrAdmin
+from dp_canteen.pagination import KeysetPagination
+from dp_canteen.throttling import throttle_scope
 
 
 class PaymentListView(generics.ListAPIView):
     """List payments for current user"""
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        return Payment.objects.filter(user=self.request.user)
+        return Payment.objects.filter(user=self.request.user).select_related('order')
 
 
 class PaymentDetailView(generics.RetrieveAPIView):
@@ -42,6 +46,7 @@ class PaymentDetailView(generics.RetrieveAPIView):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def initiate_payment(request):
     """
     Initiate payment for an order
@@ -116,8 +121,10 @@ def initiate_payment(request):
     })
 
 
+@throttle_scope('payment_confirm')
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 @transaction.atomic
 def confirm_payment(request):
     """
@@ -148,15 +155,19 @@ def confirm_payment(request):
         )
     
     if payment_status == 'success':
+        # Update order first; a cancelled or already paid order stays as it is
+        if not order.mark_as_paid():
+            return Response(
+                {'error': 'Order is not pending payment'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
         # Update payment
         payment.status = Payment.Status.SUCCESS
         payment.upi_transaction_id = transaction_id
         payment.completed_at = timezone.now()
         payment.save()
         
-        # Update order
-        order.mark_as_paid()
-        
         # Generate QR code
         encrypted_data, expires_at = create_encrypted_qr(order)
         
@@ -251,6 +262,7 @@ def get_order_qr(request, order_id):
 
 
 # Manager endpoints
+@throttle_scope('qr_verify')
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated, IsManagerOrAdmin])
 @transaction.atomic
@@ -321,8 +333,13 @@ def confirm_qr_scan(request):
     
     order = result['order']
     
-    # Mark QR as used
-    order.mark_qr_used()
+    # Mark QR as used; of two managers scanning the same code, one gets here
+    if not order.mark_qr_used():
+        return Response({
+            'success': False,
+            'error': 'QR code already used',
+            'code': 'already_used',
+        }, status=status.HTTP_409_CONFLICT)
     
     # Update QR code record
     try:
@@ -334,8 +351,14 @@ def confirm_qr_scan(request):
     except QRCode.DoesNotExist:
         pass
     
-    # Confirm the order
-    order.confirm_order()
+    # Confirm the order unless it has already moved past paid
+    if order.status == Order.Status.PAID and not order.confirm_order():
+        transaction.set_rollback(True)
+        return Response({
+            'success': False,
+            'error': 'Order status changed, scan again',
+            'code': 'invalid_status',
+        }, status=status.HTTP_409_CONFLICT)
     
     return Response({
         'success': True,